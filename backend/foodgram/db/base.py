@@ -0,0 +1,95 @@
+import threading
+
+import psycopg2.extras
+from django.db.backends.postgresql import base
+from foodgram.db.pool import ConnectionPool
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool_stats():
+    with _pools_lock:
+        pools = dict(_pools)
+    return {alias: pool.stats() for alias, pool in pools.items()}
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """
+    Бэкенд PostgreSQL с проверкой живости постоянных соединений
+    и необязательным пулом соединений внутри процесса.
+
+    Дополнительные ключи настроек базы:
+    HEALTH_CHECKS - проверять переиспользуемое соединение перед
+    первым запросом в рамках HTTP-запроса;
+    POOL - словарь с MAX_SIZE, TIMEOUT и CHECK_AFTER; пул включается
+    при MAX_SIZE > 0.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.health_check_done = False
+        self.discard_connection = False
+
+    @property
+    def health_checks_enabled(self):
+        return self.settings_dict.get('HEALTH_CHECKS', False)
+
+    def get_pool(self):
+        options = self.settings_dict.get('POOL') or {}
+        if not options.get('MAX_SIZE'):
+            return None
+        with _pools_lock:
+            pool = _pools.get(self.alias)
+            if pool is None:
+                conn_params = self.get_connection_params()
+                pool = _pools[self.alias] = ConnectionPool(
+                    lambda: base.Database.connect(**conn_params),
+                    max_size=options['MAX_SIZE'],
+                    timeout=options.get('TIMEOUT', 10),
+                    check_after=options.get('CHECK_AFTER', 30),
+                )
+        return pool
+
+    def get_new_connection(self, conn_params):
+        pool = self.get_pool()
+        if pool is None:
+            return super().get_new_connection(conn_params)
+        connection = pool.get()
+        options = self.settings_dict['OPTIONS']
+        self.isolation_level = options.get('isolation_level',
+                                           connection.isolation_level)
+        if self.isolation_level != connection.isolation_level:
+            connection.set_session(isolation_level=self.isolation_level)
+        psycopg2.extras.register_default_jsonb(
+            conn_or_curs=connection, loads=lambda x: x
+        )
+        return connection
+
+    def _close(self):
+        pool = self.get_pool()
+        if pool is None or self.connection is None:
+            return super()._close()
+        connection = self.connection
+        if self.discard_connection:
+            self.discard_connection = False
+            pool.discard(connection)
+        else:
+            pool.put(connection)
+
+    def close_if_unusable_or_obsolete(self):
+        super().close_if_unusable_or_obsolete()
+        self.health_check_done = False
+
+    def ensure_connection(self):
+        if (
+            self.connection is not None
+            and self.health_checks_enabled
+            and not self.health_check_done
+            and not self.in_atomic_block
+        ):
+            self.health_check_done = True
+            if not self.is_usable():
+                self.discard_connection = True
+                self.close()
+        super().ensure_connection()
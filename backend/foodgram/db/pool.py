@@ -0,0 +1,115 @@
+import threading
+import time
+from collections import deque
+
+from django.db.utils import OperationalError
+from psycopg2 import extensions
+
+
+class ConnectionPool:
+    """
+    Пул соединений psycopg2 внутри процесса. Соединение, вернувшееся
+    в пул, откатывает незавершённую транзакцию; разорванные соединения
+    выбрасываются. Если все соединения заняты, get() ждёт до timeout.
+    """
+
+    def __init__(self, connect, max_size, timeout=10, check_after=30):
+        self.connect = connect
+        self.max_size = max_size
+        self.timeout = timeout
+        self.check_after = check_after
+        self.size = 0
+        self.idle = deque()
+        self.condition = threading.Condition()
+        self.created = 0
+        self.reused = 0
+        self.waits = 0
+        self.connect_time = 0.0
+
+    def get(self):
+        deadline = time.monotonic() + self.timeout
+        with self.condition:
+            while not self.idle and self.size >= self.max_size:
+                self.waits += 1
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not self.condition.wait(remaining):
+                    raise OperationalError(
+                        f'Пул соединений исчерпан ({self.max_size}).'
+                    )
+            if self.idle:
+                connection, released_at = self.idle.pop()
+                self.reused += 1
+            else:
+                connection = None
+                self.size += 1
+        if connection is not None:
+            if self.is_usable(connection, released_at):
+                return connection
+            self.discard(connection)
+            return self.get()
+        started = time.monotonic()
+        try:
+            connection = self.connect()
+        except Exception:
+            with self.condition:
+                self.size -= 1
+                self.condition.notify()
+            raise
+        with self.condition:
+            self.created += 1
+            self.connect_time += time.monotonic() - started
+        return connection
+
+    def is_usable(self, connection, released_at):
+        if connection.closed:
+            return False
+        if time.monotonic() - released_at < self.check_after:
+            return True
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+        except Exception:
+            return False
+        return True
+
+    def put(self, connection):
+        if connection.closed:
+            self.discard(connection)
+            return
+        status = connection.info.transaction_status
+        if status == extensions.TRANSACTION_STATUS_UNKNOWN:
+            self.discard(connection)
+            return
+        if status != extensions.TRANSACTION_STATUS_IDLE:
+            try:
+                connection.rollback()
+            except Exception:
+                self.discard(connection)
+                return
+        with self.condition:
+            self.idle.append((connection, time.monotonic()))
+            self.condition.notify()
+
+    def discard(self, connection):
+        try:
+            connection.close()
+        except Exception:
+            pass
+        with self.condition:
+            self.size -= 1
+            self.condition.notify()
+
+    def stats(self):
+        with self.condition:
+            return {
+                'max_size': self.max_size,
+                'size': self.size,
+                'idle': len(self.idle),
+                'in_use': self.size - len(self.idle),
+                'created': self.created,
+                'reused': self.reused,
+                'waits': self.waits,
+                'avg_connect_ms': round(
+                    self.connect_time / self.created * 1000, 2
+                ) if self.created else 0.0,
+            }
@@ -0,0 +1,108 @@
+import json
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+logger = logging.getLogger('foodgram.profiling')
+
+IN_LIST = re.compile(r'IN \((?:%s, )*%s\)')
+NUMBER = re.compile(r'\b\d+\b')
+
+_current = ContextVar('profiling_current', default=None)
+
+
+def fingerprint(sql):
+    """
+    Приводит SQL к виду без значений, чтобы одинаковые запросы
+    с разными параметрами считались повторами (признак N+1).
+    """
+    return NUMBER.sub('N', IN_LIST.sub('IN (...)', sql))
+
+
+class RequestProfile:
+    def __init__(self):
+        self.queries = Counter()
+        self.query_count = 0
+        self.sql_time = 0.0
+        self.serializer_time = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_time += time.perf_counter() - started
+            self.query_count += 1
+            self.queries[fingerprint(sql)] += 1
+
+    def duplicates(self):
+        return [
+            {'sql': sql[:200], 'count': count}
+            for sql, count in self.queries.most_common(5) if count > 1
+        ]
+
+
+def current_profile():
+    """
+    Профиль текущего запроса или None, если профилирование выключено.
+    """
+    return _current.get()
+
+
+class ProfilingMiddleware:
+    """
+    Замеряет для каждого запроса число и время SQL-запросов, повторы
+    запросов, время сериализации и размер ответа. Время сериализации
+    записывают представления с SerializerTimingMixin. Результат уходит
+    в заголовок Server-Timing и в лог foodgram.profiling одной
+    JSON-строкой. Включается настройкой PROFILING_ENABLED.
+    """
+
+    def __init__(self, get_response):
+        if not settings.PROFILING_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        profile = RequestProfile()
+        token = _current.set(profile)
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(profile))
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        total = time.perf_counter() - started
+        duplicates = profile.duplicates()
+        response['Server-Timing'] = ', '.join((
+            f'db;dur={profile.sql_time * 1000:.1f};'
+            f'desc="{profile.query_count} queries"',
+            f'serializer;dur={profile.serializer_time * 1000:.1f}',
+            f'dup;desc="{len(duplicates)} repeated"',
+            f'total;dur={total * 1000:.1f}',
+        ))
+        match = request.resolver_match
+        logger.info(json.dumps({
+            'view': match.view_name if match else None,
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'total_ms': round(total * 1000, 2),
+            'sql_ms': round(profile.sql_time * 1000, 2),
+            'queries': profile.query_count,
+            'serializer_ms': round(profile.serializer_time * 1000, 2),
+            'size': (
+                None if response.streaming else len(response.content)
+            ),
+            'duplicates': duplicates,
+        }, ensure_ascii=False))
+        return response
@@ -32,6 +32,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'foodgram.middleware.ProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -41,6 +42,32 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+PROFILING_ENABLED = env.bool('PROFILING_ENABLED', False)
+PROFILING_LOG_FILE = env.str('PROFILING_LOG_FILE', '')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'message': {'format': '%(message)s'},
+    },
+    'handlers': {
+        'profiling': (
+            {'class': 'logging.FileHandler', 'filename': PROFILING_LOG_FILE,
+             'formatter': 'message'}
+            if PROFILING_LOG_FILE else
+            {'class': 'logging.StreamHandler', 'formatter': 'message'}
+        ),
+    },
+    'loggers': {
+        'foodgram.profiling': {
+            'handlers': ['profiling'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
+
 ROOT_URLCONF = 'foodgram.urls'
 
 TEMPLATES = [
@@ -61,17 +88,45 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'foodgram.wsgi.application'
 
+DB_POOL_MAX_SIZE = env.int('DB_POOL_MAX_SIZE', 0)
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
+        # DB_ENGINE=django.db.backends.sqlite3 позволяет запускать тесты
+        # без PostgreSQL.
+        'ENGINE': env.str('DB_ENGINE', 'foodgram.db'),
         'NAME': env.str('POSTGRES_DB', 'django'),
         'USER': env.str('POSTGRES_USER', 'django'),
         'PASSWORD': env.str('POSTGRES_PASSWORD', 'postgres'),
         'HOST': env.str('DB_HOST', 'localhost'),
-        'PORT': env.str('DB_PORT', 5432)
+        'PORT': env.str('DB_PORT', 5432),
+        # С пулом соединение возвращается в пул в конце каждого запроса.
+        'CONN_MAX_AGE': (
+            0 if DB_POOL_MAX_SIZE else env.int('DB_CONN_MAX_AGE', 60)
+        ),
+        'HEALTH_CHECKS': env.bool('DB_CONN_HEALTH_CHECKS', True),
+        'POOL': {
+            'MAX_SIZE': DB_POOL_MAX_SIZE,
+            'TIMEOUT': env.int('DB_POOL_TIMEOUT', 10),
+            'CHECK_AFTER': env.int('DB_POOL_CHECK_AFTER', 30),
+        },
     }
 }
 
+# Покрывающие индексы избранного и списка покупок (include=) работают
+# только в PostgreSQL; SQLite в CI строит их без неключевых столбцов
+# и предупреждает об этом при каждом запуске.
+SILENCED_SYSTEM_CHECKS = ['models.W040']
+
+CACHES = {
+    'default': env.cache('CACHE_URL', 'locmemcache://'),
+    # Локальный кэш не видит выход пользователя в других воркерах,
+    # поэтому по умолчанию токены живут в нём недолго.
+    'tokens': env.cache(
+        'TOKEN_CACHE_URL', 'locmemcache://tokens?timeout=60&max_entries=10000'
+    ),
+}
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -103,6 +158,20 @@ STATIC_ROOT = BASE_DIR / 'collected_static'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+IMAGE_WORKERS = env.int('IMAGE_WORKERS', 2)
+THUMBNAIL_QUALITY = env.int('THUMBNAIL_QUALITY', 80)
+
+CATALOG_CACHE_MAX_AGE = env.int('CATALOG_CACHE_MAX_AGE', 0)
+
+INGREDIENT_AUTOCOMPLETE_LIMIT = env.int('INGREDIENT_AUTOCOMPLETE_LIMIT', 50)
+
+RESPONSE_CACHE_TIMEOUT = env.int('RESPONSE_CACHE_TIMEOUT', 5 * 60)
+
+SHOPPING_LIST_CACHE_TIMEOUT = env.int('SHOPPING_LIST_CACHE_TIMEOUT', 60 * 60)
+SHOPPING_LIST_FONT = env.str(
+    'SHOPPING_LIST_FONT', '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf'
+)
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 AUTH_USER_MODEL = 'users.User'
@@ -115,7 +184,7 @@ REST_FRAMEWORK = {
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
 
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'users.authentication.CachedTokenAuthentication',
     ],
 }
 
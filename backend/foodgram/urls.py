@@ -2,11 +2,14 @@ from django.contrib import admin
 from django.urls import include, path
 from drf_spectacular.views import (SpectacularAPIView, SpectacularRedocView,
                                    SpectacularSwaggerView)
+from foodgram.views import cache_health, database_health
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('recipes.urls', namespace='recipes')),
     path('api/', include('users.urls')),
+    path('api/health/db/', database_health, name='database-health'),
+    path('api/health/cache/', cache_health, name='cache-health'),
 
     path('api/schema/', SpectacularAPIView.as_view(), name='schema'),
     path('api/schema/swagger-ui/', SpectacularSwaggerView.as_view(
@@ -0,0 +1,40 @@
+import os
+import time
+
+from django.db import connections
+from foodgram.db.base import get_pool_stats
+from recipes.cache import get_response_cache_stats, is_process_local
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+
+
+@api_view(['GET'])
+@permission_classes((IsAdminUser,))
+def database_health(request):
+    pools = get_pool_stats()
+    result = {}
+    for connection in connections.all():
+        started = time.perf_counter()
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+        result[connection.alias] = {
+            'vendor': connection.vendor,
+            'latency_ms': round((time.perf_counter() - started) * 1000, 2),
+            'conn_max_age': connection.settings_dict['CONN_MAX_AGE'],
+            'health_checks': connection.settings_dict.get('HEALTH_CHECKS',
+                                                          False),
+            'pool': pools.get(connection.alias),
+        }
+    return Response(result)
+
+
+@api_view(['GET'])
+@permission_classes((IsAdminUser,))
+def cache_health(request):
+    # С locmem счётчики относятся только к воркеру, ответившему на запрос.
+    return Response({
+        'pid': os.getpid(),
+        'process_local': is_process_local(),
+        **get_response_cache_stats(),
+    })
@@ -0,0 +1,34 @@
+import os
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8080')
+# Значения по умолчанию скромные: каждый поток держит своё постоянное
+# соединение с PostgreSQL (или берёт его из пула процесса).
+workers = int(os.environ.get('GUNICORN_WORKERS', 2))
+# Потоковые воркеры: медленный запрос к PostgreSQL занимает поток,
+# а не весь процесс.
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+
+DB_MAX_CONNECTIONS = int(os.environ.get('DB_MAX_CONNECTIONS', 20))
+DB_POOL_MAX_SIZE = int(os.environ.get('DB_POOL_MAX_SIZE', 0))
+
+
+def on_starting(server):
+    """
+    Не даёт запустить больше воркеров и потоков, чем позволяет бюджет
+    соединений с БД (DB_MAX_CONNECTIONS на этот экземпляр приложения).
+    """
+    config = server.cfg
+    per_worker = 1 if config.worker_class_str == 'sync' else config.threads
+    if DB_POOL_MAX_SIZE:
+        per_worker = min(per_worker, DB_POOL_MAX_SIZE)
+    total = config.workers * per_worker
+    if total > DB_MAX_CONNECTIONS:
+        raise RuntimeError(
+            f'{config.workers} воркеров по {per_worker} соединений '
+            f'= {total} соединений с БД, больше DB_MAX_CONNECTIONS='
+            f'{DB_MAX_CONNECTIONS}. Уменьшите GUNICORN_WORKERS, '
+            'GUNICORN_THREADS или DB_POOL_MAX_SIZE.'
+        )
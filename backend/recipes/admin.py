@@ -1,6 +1,6 @@
 from django.contrib import admin
 from recipes.models import (FavoriteRecipe, Ingredient, Recipe,
-                            RecipeIngredient, ShoppingCart, Tag)
+                            RecipeIngredient, RecipeTrend, ShoppingCart, Tag)
 
 
 class RecipeIngredientsInline(admin.TabularInline):
@@ -15,7 +15,10 @@ class RecipeAdmin(admin.ModelAdmin):
     ordering = ['-created_at']
 
     def counts(self, obj):
-        return obj.favorite_recipes.count()
+        return obj.favorites_count
+
+    counts.short_description = 'В избранном'
+    counts.admin_order_field = 'favorites_count'
 
 
 @admin.register(Tag)
@@ -53,3 +56,9 @@ class ShoppingCartAdmin(admin.ModelAdmin):
         return f'Запись на покупку номер {obj.id}'
 
     admin_title.short_description = "Идентификатор покупки"
+
+
+@admin.register(RecipeTrend)
+class RecipeTrendAdmin(admin.ModelAdmin):
+    list_display = ('recipe', 'score', 'updated_at')
+    ordering = ['-score']
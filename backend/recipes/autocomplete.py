@@ -0,0 +1,71 @@
+import threading
+from bisect import bisect_left
+
+from recipes.cache import INGREDIENTS_VERSION, get_version
+from recipes.models import Ingredient
+
+
+class IngredientIndex:
+    """
+    Индекс ингредиентов в памяти процесса для автодополнения.
+    Хранит отсортированный по названию список и ищет префикс бинарным
+    поиском, а подстроку — линейным проходом по тому же списку.
+    Перестраивается при смене версии ингредиентов в БД; версию, уже
+    прочитанную представлением, можно передать в all и search, чтобы
+    не запрашивать её ещё раз. Ключи и элементы хранятся одним
+    кортежем и заменяются одним присваиванием, чтобы параллельный
+    поиск не увидел ключи и элементы разных версий.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._index = ((), ())
+
+    def _load(self, version=None):
+        if version is None:
+            version = get_version(INGREDIENTS_VERSION)
+        if version == self._version:
+            return self._index
+        with self._lock:
+            if version == self._version:
+                return self._index
+            rows = sorted(
+                (name.casefold(), pk, name, unit)
+                for pk, name, unit in Ingredient.objects.values_list(
+                    'id', 'name', 'measurement_unit'
+                )
+            )
+            self._index = (
+                tuple(row[0] for row in rows),
+                tuple(
+                    {'id': pk, 'name': name, 'measurement_unit': unit}
+                    for _, pk, name, unit in rows
+                ),
+            )
+            self._version = version
+            return self._index
+
+    def all(self, version=None):
+        _, items = self._load(version)
+        return list(items)
+
+    def search(self, query, limit, version=None):
+        keys, items = self._load(version)
+        query = query.casefold()
+        start = bisect_left(keys, query)
+        end = start
+        while end < len(keys) and keys[end].startswith(query):
+            end += 1
+        result = list(items[start:min(end, start + limit)])
+        if len(result) < limit:
+            for position, key in enumerate(keys):
+                if start <= position < end or query not in key:
+                    continue
+                result.append(items[position])
+                if len(result) == limit:
+                    break
+        return result
+
+
+ingredient_index = IngredientIndex()
@@ -0,0 +1,100 @@
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import cycle, islice
+from urllib.error import HTTPError, URLError
+from urllib.parse import quote
+from urllib.request import Request, urlopen
+
+from django.conf import settings
+
+
+def percentile(values, percent):
+    """
+    Перцентиль методом ближайшего ранга; values должны быть отсортированы.
+    """
+    if not values:
+        return 0.0
+    index = max(0, min(len(values) - 1,
+                       round(percent / 100 * len(values) + 0.5) - 1))
+    return values[index]
+
+
+def summarize(latencies, elapsed, errors=0):
+    latencies = sorted(latencies)
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'rps': round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+    }
+
+
+def timed_request(url, headers=None, timeout=30):
+    started = time.perf_counter()
+    try:
+        with urlopen(Request(url, headers=headers or {}),
+                     timeout=timeout) as response:
+            response.read()
+            ok = response.status < 400
+    except HTTPError as error:
+        ok = error.code < 400
+    except OSError:
+        ok = False
+    return time.perf_counter() - started, ok
+
+
+def http_load(base_url, paths, total, concurrency, headers=None):
+    """
+    Отправляет total запросов по кругу на paths в concurrency потоков
+    и возвращает сводку по пропускной способности и задержкам.
+    """
+    urls = [base_url.rstrip('/') + quote(path, safe='/?=&') for path in paths]
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(
+            lambda url: timed_request(url, headers),
+            islice(cycle(urls), total)
+        ))
+    elapsed = time.perf_counter() - started
+    latencies = [latency for latency, ok in results if ok]
+    return summarize(latencies, elapsed, errors=len(results) - len(latencies))
+
+
+def start_gunicorn(port, worker_class='gthread', workers=2, threads=4):
+    """
+    Запускает gunicorn с конфигурацией проекта на 127.0.0.1:port
+    и текущими настройками Django.
+    """
+    command = [
+        sys.executable, '-m', 'gunicorn',
+        '--config', str(settings.BASE_DIR / 'gunicorn.conf.py'),
+        '--bind', f'127.0.0.1:{port}',
+        '--workers', str(workers),
+        '--threads', str(threads),
+        '--worker-class', worker_class,
+        '--log-level', 'warning',
+        'foodgram.wsgi',
+    ]
+    env = dict(os.environ,
+               DJANGO_SETTINGS_MODULE=os.environ.get(
+                   'DJANGO_SETTINGS_MODULE', 'foodgram.settings'
+               ))
+    return subprocess.Popen(command, cwd=settings.BASE_DIR, env=env)
+
+
+def wait_ready(server, base_url, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError('gunicorn завершился при запуске.')
+        try:
+            urlopen(base_url + '/api/tags/', timeout=1).read()
+            return
+        except (URLError, OSError):
+            time.sleep(0.2)
+    raise RuntimeError('gunicorn не ответил за отведённое время.')
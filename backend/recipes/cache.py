@@ -0,0 +1,104 @@
+import hashlib
+
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from recipes.models import DataVersion
+
+INGREDIENTS_VERSION = 'ingredients:version'
+RECIPES_VERSION = 'recipes:version'
+TAGS_VERSION = 'tags:version'
+
+RESPONSE_CACHE_HITS = 'recipes:response:hits'
+RESPONSE_CACHE_MISSES = 'recipes:response:misses'
+
+
+def get_version_info(key: str) -> tuple:
+    """
+    Возвращает версию набора данных и время её изменения (timestamp)
+    одним запросом по первичному ключу. Версия хранится в БД, поэтому
+    её изменение сразу видно всем воркерам.
+    """
+    row = DataVersion.objects.filter(key=key).values_list(
+        'version', 'modified'
+    ).first()
+    if row is None:
+        data_version, _ = DataVersion.objects.get_or_create(key=key)
+        row = data_version.version, data_version.modified
+    version, modified = row
+    return version, modified.timestamp()
+
+
+def get_version(key: str) -> int:
+    """
+    Возвращает текущую версию набора данных. Версия входит в ключи
+    кэша, поэтому её увеличение делает старые записи недоступными.
+    """
+    return get_version_info(key)[0]
+
+
+def get_last_modified(key: str) -> float:
+    """
+    Возвращает время последнего изменения набора данных (timestamp).
+    """
+    return get_version_info(key)[1]
+
+
+def bump_version(key: str) -> None:
+    """
+    Увеличивает версию набора данных после фиксации транзакции,
+    чтобы параллельный запрос не закэшировал незафиксированное состояние
+    и строка версии не блокировалась на всё время транзакции.
+    """
+    def bump():
+        updated = DataVersion.objects.filter(key=key).update(
+            version=F('version') + 1, modified=timezone.now()
+        )
+        if not updated:
+            DataVersion.objects.get_or_create(key=key,
+                                              defaults={'version': 1})
+
+    transaction.on_commit(bump)
+
+
+def is_process_local(alias='default') -> bool:
+    """
+    True, если кэш живёт в памяти процесса и не виден другим воркерам
+    и manage.py.
+    """
+    return isinstance(caches[alias], LocMemCache)
+
+
+def get_response_cache_stats() -> dict:
+    hits = cache.get(RESPONSE_CACHE_HITS, 0)
+    misses = cache.get(RESPONSE_CACHE_MISSES, 0)
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_ratio': round(hits / total, 3) if total else 0.0,
+    }
+
+
+def incr_counter(key: str) -> None:
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 0, timeout=None)
+        cache.incr(key)
+
+
+def response_cache_key(request, prefix: str, version: int) -> str:
+    """
+    Ключ кэша ответа: хост (он попадает в ссылки пагинации), путь и
+    отсортированные параметры запроса, чтобы ?a=1&b=2 и ?b=2&a=1
+    совпадали.
+    """
+    params = sorted(
+        (name, sorted(values)) for name, values in request.GET.lists()
+    )
+    raw = f'{request.get_host()}{request.path}{params}'
+    digest = hashlib.md5(raw.encode()).hexdigest()
+    return f'{prefix}:{version}:{digest}'
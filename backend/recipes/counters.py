@@ -0,0 +1,50 @@
+from django.contrib.auth import get_user_model
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+from recipes.models import FavoriteRecipe, Recipe, ShoppingCart
+from users.models import Subscribe
+
+User = get_user_model()
+
+RECIPE_COUNTERS = {
+    FavoriteRecipe: 'favorites_count',
+    ShoppingCart: 'in_carts_count',
+}
+
+
+def change_counter(queryset, field, delta):
+    """
+    Атомарно меняет счётчик одним UPDATE с F()-выражением.
+    Значение не опускается ниже нуля, даже если счётчик рассинхронизирован.
+    """
+    return queryset.update(**{field: Greatest(F(field) + delta, 0)})
+
+
+def count_subquery(model, field):
+    return Coalesce(
+        Subquery(
+            model.objects
+            .filter(**{field: OuterRef('pk')})
+            .order_by()
+            .values(field)
+            .annotate(total=Count('pk'))
+            .values('total')
+        ),
+        0
+    )
+
+
+def recount_all():
+    """
+    Пересчитывает все денормализованные счётчики двумя UPDATE
+    с коррелированными подзапросами.
+    """
+    recipes = Recipe.objects.update(
+        favorites_count=count_subquery(FavoriteRecipe, 'recipe'),
+        in_carts_count=count_subquery(ShoppingCart, 'recipe'),
+    )
+    users = User.objects.update(
+        recipes_count=count_subquery(Recipe, 'author'),
+        subscribers_count=count_subquery(Subscribe, 'author'),
+    )
+    return recipes, users
@@ -0,0 +1,76 @@
+import base64
+import hashlib
+import mimetypes
+
+from django.core.files.storage import default_storage
+from drf_extra_fields.fields import Base64ImageField
+from recipes.images import thumbnail_srcset
+from rest_framework import serializers
+
+INLINE_IMAGES_PARAM = 'image_format'
+INLINE_IMAGES_VALUE = 'base64'
+
+
+class HashedBase64ImageField(Base64ImageField):
+    """
+    Base64ImageField, сохраняющий файл под именем из хэша содержимого.
+    Такие URL не меняют содержимое и могут кэшироваться надолго.
+    """
+
+    def get_file_name(self, decoded_file):
+        return hashlib.sha256(decoded_file).hexdigest()[:32]
+
+
+class ImageUrlField(serializers.Field):
+    """
+    Абсолютный URL картинки. Файл при этом не читается. Содержимое
+    в base64 отдаётся, только если запрошено параметром
+    ?image_format=base64.
+    """
+
+    def __init__(self, **kwargs):
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def inline_requested(self):
+        request = self.context.get('request')
+        return (
+            request is not None
+            and request.GET.get(INLINE_IMAGES_PARAM) == INLINE_IMAGES_VALUE
+        )
+
+    def to_representation(self, value):
+        if not value:
+            return None
+        if self.inline_requested():
+            content_type, _ = mimetypes.guess_type(value.name)
+            with value.open('rb') as file:
+                data = base64.b64encode(file.read()).decode()
+            return f'data:{content_type};base64,{data}'
+        request = self.context.get('request')
+        url = value.url
+        return request.build_absolute_uri(url) if request else url
+
+
+class SrcsetField(serializers.Field):
+    """
+    Значение srcset с WebP-миниатюрами картинки рецепта. Пока миниатюры
+    не созданы (thumbnails_ready), отдаётся пустая строка, чтобы клиент
+    не получал ссылки на несуществующие файлы.
+    """
+
+    def __init__(self, **kwargs):
+        kwargs['source'] = '*'
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, recipe):
+        if not recipe.image or not recipe.thumbnails_ready:
+            return ''
+        request = self.context.get('request')
+
+        def url(name):
+            url = default_storage.url(name)
+            return request.build_absolute_uri(url) if request else url
+
+        return thumbnail_srcset(recipe.image.name, url)
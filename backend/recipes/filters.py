@@ -1,14 +1,15 @@
-from django_filters import filters
-from django_filters.rest_framework import FilterSet
-from recipes.models import Ingredient, Recipe, Tag
+from django_filters.rest_framework import FilterSet, filters
+from recipes.models import Recipe, Tag
+from recipes.search import search_recipes
 
-
-class IngredientFilter(FilterSet):
-    name = filters.CharFilter(lookup_expr='startswith')
-
-    class Meta:
-        model = Ingredient
-        fields = ['name']
+RECIPE_ORDERINGS = {
+    'popular': ('-favorites_count', '-created_at', '-id'),
+    'trending': ('-trending_score', '-created_at', '-id'),
+    'cooking_time': ('cooking_time', '-created_at', '-id'),
+}
+# Курсор хранит значения всех полей порядка (см. CustomCursorPagination),
+# поэтому missing_count и coverage с массой совпадений не приводят к OFFSET.
+MATCH_ORDERING = ('missing_count', '-coverage', '-created_at', '-id')
 
 
 class RecipeFilter(FilterSet):
@@ -23,6 +24,11 @@ class RecipeFilter(FilterSet):
     is_in_shopping_cart = filters.BooleanFilter(
         method='get_is_in_shopping_cart'
     )
+    search = filters.CharFilter(method='get_search')
+    ordering = filters.ChoiceFilter(
+        choices=[(name, name) for name in RECIPE_ORDERINGS],
+        method='get_ordering'
+    )
 
     class Meta:
         model = Recipe
@@ -30,14 +36,16 @@ class RecipeFilter(FilterSet):
 
     def get_is_favorited(self, queryset, name, value):
         if value and self.request.user.is_authenticated:
-            return queryset.filter(
-                favorites__author=self.request.user,
-            )
+            return queryset.filter(is_favorited=True)
         return queryset
 
     def get_is_in_shopping_cart(self, queryset, name, value):
         if value and self.request.user.is_authenticated:
-            return queryset.filter(
-                shopping_list__author=self.request.user,
-            )
+            return queryset.filter(is_in_shopping_cart=True)
         return queryset
+
+    def get_search(self, queryset, name, value):
+        return search_recipes(queryset, value)
+
+    def get_ordering(self, queryset, name, value):
+        return queryset.order_by(*RECIPE_ORDERINGS[value])
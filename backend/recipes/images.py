@@ -0,0 +1,101 @@
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from PIL import Image, ImageOps
+from recipes.cache import RECIPES_VERSION, bump_version
+from recipes.models import Recipe
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_WIDTHS = (240, 480, 960)
+THUMBNAIL_EXTENSION = 'webp'
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.IMAGE_WORKERS,
+                thread_name_prefix='thumbnails'
+            )
+    return _executor
+
+
+def thumbnail_name(name, width, extension):
+    directory, filename = os.path.split(name)
+    stem, _ = os.path.splitext(filename)
+    return f'{directory}/thumbs/{stem}-{width}.{extension}'
+
+
+def thumbnail_srcset(name, url, extension=THUMBNAIL_EXTENSION):
+    """
+    Строит значение srcset для миниатюр картинки. Имена миниатюр
+    вычисляются из имени оригинала, хранилище при этом не читается.
+    """
+    return ', '.join(
+        f'{url(thumbnail_name(name, width, extension))} {width}w'
+        for width in THUMBNAIL_WIDTHS
+    )
+
+
+def has_transparency(image):
+    return (image.mode in ('RGBA', 'LA', 'PA')
+            or 'transparency' in image.info)
+
+
+def generate_thumbnails(name):
+    """
+    Создаёт WebP-миниатюры картинки для всех ширин из THUMBNAIL_WIDTHS
+    (с прозрачностью, если она есть в оригинале) и отмечает рецепты
+    с этой картинкой в thumbnails_ready: только тогда им отдаётся
+    srcset. Оригинал остаётся запасным вариантом для клиентов без WebP.
+    """
+    with default_storage.open(name) as file:
+        image = Image.open(file)
+        image.load()
+    mode = 'RGBA' if has_transparency(image) else 'RGB'
+    image = ImageOps.exif_transpose(image).convert(mode)
+    for width in THUMBNAIL_WIDTHS:
+        thumbnail = image.copy()
+        thumbnail.thumbnail((width, image.height))
+        buffer = BytesIO()
+        thumbnail.save(buffer, 'WEBP', quality=settings.THUMBNAIL_QUALITY)
+        target = thumbnail_name(name, width, THUMBNAIL_EXTENSION)
+        default_storage.delete(target)
+        default_storage.save(target, ContentFile(buffer.getvalue()))
+    if Recipe.objects.filter(image=name, thumbnails_ready=False).update(
+        thumbnails_ready=True
+    ):
+        bump_version(RECIPES_VERSION)
+
+
+def _generate_thumbnails_safely(name):
+    try:
+        generate_thumbnails(name)
+    except Exception:
+        logger.exception('Не удалось создать миниатюры для %s', name)
+
+
+def schedule_thumbnails(name):
+    """
+    Ставит генерацию миниатюр в пул потоков после фиксации транзакции,
+    чтобы ресайз не занимал воркер, обрабатывающий запрос.
+    При IMAGE_WORKERS = 0 миниатюры создаются синхронно.
+    """
+    if settings.IMAGE_WORKERS:
+        transaction.on_commit(
+            lambda: get_executor().submit(_generate_thumbnails_safely, name)
+        )
+    else:
+        transaction.on_commit(lambda: _generate_thumbnails_safely(name))
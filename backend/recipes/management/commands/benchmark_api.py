@@ -0,0 +1,195 @@
+import json
+import platform
+import statistics
+import time
+from urllib.parse import urlencode
+
+import django
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import F
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from recipes.benchmark import http_load, start_gunicorn, summarize, wait_ready
+from recipes.models import (DataVersion, FavoriteRecipe, Recipe,
+                            RecipeIngredient, ShoppingCart, Tag)
+from rest_framework.authtoken.models import Token
+from users.models import Subscribe
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        'Прогоняет основные эндпоинты recipes и users через тестовый '
+        'клиент Django и через gunicorn и печатает JSON с пропускной '
+        'способностью, перцентилями задержки и числом SQL-запросов. '
+        'Тестовый клиент меряет отдельно холодные запросы (кэш и версии '
+        'данных сброшены) и тёплые; HTTP-нагрузка меряет тёплый кэш.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help='Email пользователя для '
+                                           'эндпоинтов с авторизацией.')
+        parser.add_argument('--requests', type=int, default=30,
+                            help='Запросов на эндпоинт через тестовый '
+                                 'клиент.')
+        parser.add_argument('--http-requests', type=int, default=200,
+                            help='Запросов на эндпоинт через HTTP.')
+        parser.add_argument('--concurrency', type=int, default=8)
+        parser.add_argument('--worker-class', default='gthread')
+        parser.add_argument('--workers', type=int, default=2)
+        parser.add_argument('--threads', type=int, default=4)
+        parser.add_argument('--port', type=int, default=8766)
+        parser.add_argument('--skip-http', action='store_true',
+                            help='Не запускать gunicorn.')
+        parser.add_argument('--output', help='Файл для JSON-результата.')
+
+    def get_user(self, email):
+        users = User.objects.all()
+        if email:
+            users = users.filter(email=email)
+        user = users.order_by('-recipes_count', 'id').first()
+        if user is None:
+            raise CommandError('Нет пользователя; сначала выполните '
+                               'generate_data.')
+        return user
+
+    def get_endpoints(self):
+        recipe = Recipe.objects.order_by('-favorites_count', '-id').first()
+        if recipe is None:
+            raise CommandError('Нет рецептов; сначала выполните '
+                               'generate_data.')
+        ingredients = RecipeIngredient.objects.filter(
+            recipe=recipe
+        ).values_list('ingredient_id', flat=True)[:3]
+        tag = Tag.objects.order_by('id').first()
+        match = urlencode([('ingredients', pk) for pk in ingredients])
+        return {
+            'recipes.list': ('/api/recipes/', False),
+            'recipes.list.auth': ('/api/recipes/', True),
+            'recipes.list.popular': ('/api/recipes/?ordering=popular',
+                                     False),
+            'recipes.list.tag': (f'/api/recipes/?tags={tag.slug}', False),
+            'recipes.list.favorited': ('/api/recipes/?is_favorited=1',
+                                       True),
+            'recipes.search': ('/api/recipes/?search=суп', False),
+            'recipes.match': (f'/api/recipes/match/?{match}', False),
+            'recipes.detail': (f'/api/recipes/{recipe.id}/', False),
+            'recipes.download_shopping_cart': (
+                '/api/recipes/download_shopping_cart/', True
+            ),
+            'tags.list': ('/api/tags/', False),
+            'ingredients.search': ('/api/ingredients/?name=мо', False),
+            'users.list': ('/api/users/', False),
+            'users.me': ('/api/users/me/', True),
+            'users.subscriptions': (
+                '/api/users/subscriptions/?recipes_limit=3', True
+            ),
+        }
+
+    def invalidate(self):
+        """
+        Сбрасывает кэш ответов и версии данных, чтобы следующий запрос
+        прошёл весь путь до БД, включая перестройку индекса
+        автодополнения.
+        """
+        cache.clear()
+        DataVersion.objects.update(version=F('version') + 1,
+                                   modified=timezone.now())
+
+    def measure(self, client, path, headers, requests, cold):
+        latencies, queries, statuses = [], [], set()
+        if not cold:
+            client.get(path, **headers)
+        for _ in range(requests):
+            if cold:
+                self.invalidate()
+            started = time.perf_counter()
+            with CaptureQueriesContext(connection) as context:
+                response = client.get(path, **headers)
+                if response.streaming:
+                    b''.join(response.streaming_content)
+            latencies.append(time.perf_counter() - started)
+            queries.append(len(context.captured_queries))
+            statuses.add(response.status_code)
+        return {
+            **summarize(latencies, sum(latencies)),
+            'status': sorted(statuses),
+            'queries_first': queries[0],
+            'queries_median': statistics.median(queries),
+        }
+
+    def run_client(self, endpoints, token, requests):
+        client = Client(HTTP_HOST='localhost')
+        results = {}
+        for name, (path, auth) in endpoints.items():
+            headers = {'HTTP_AUTHORIZATION': f'Token {token}'} if auth else {}
+            results[name] = {
+                mode: self.measure(client, path, headers, requests,
+                                   mode == 'cold')
+                for mode in ('cold', 'warm')
+            }
+        return results
+
+    def run_http(self, endpoints, token, options):
+        base_url = f'http://127.0.0.1:{options["port"]}'
+        server = start_gunicorn(options['port'], options['worker_class'],
+                                options['workers'], options['threads'])
+        try:
+            wait_ready(server, base_url)
+            return {
+                name: http_load(
+                    base_url, [path], options['http_requests'],
+                    options['concurrency'],
+                    headers={'Authorization': f'Token {token}'}
+                    if auth else None
+                )
+                for name, (path, auth) in endpoints.items()
+            }
+        except RuntimeError as error:
+            raise CommandError(error)
+        finally:
+            server.terminate()
+            server.wait()
+
+    def handle(self, *args, **options):
+        user = self.get_user(options['user'])
+        token, _ = Token.objects.get_or_create(user=user)
+        endpoints = self.get_endpoints()
+        report = {
+            'meta': {
+                'timestamp': timezone.now().isoformat(),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'database': connection.vendor,
+                'user': user.email,
+                'data': {
+                    'users': User.objects.count(),
+                    'recipes': Recipe.objects.count(),
+                    'recipe_ingredients': RecipeIngredient.objects.count(),
+                    'favorites': FavoriteRecipe.objects.count(),
+                    'shopping_carts': ShoppingCart.objects.count(),
+                    'subscriptions': Subscribe.objects.count(),
+                },
+                'options': {
+                    key: options[key] for key in (
+                        'requests', 'http_requests', 'concurrency',
+                        'worker_class', 'workers', 'threads'
+                    )
+                },
+            },
+            'client': self.run_client(endpoints, token.key,
+                                      options['requests']),
+        }
+        if not options['skip_http']:
+            report['http'] = self.run_http(endpoints, token.key, options)
+        output = json.dumps(report, indent=2, ensure_ascii=False)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                file.write(output)
+        else:
+            self.stdout.write(output)
@@ -0,0 +1,50 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from recipes.benchmark import http_load, start_gunicorn, wait_ready
+
+DEFAULT_PATHS = (
+    '/api/recipes/',
+    '/api/recipes/?ordering=popular',
+    '/api/tags/',
+    '/api/ingredients/?name=мо',
+    '/api/users/',
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Запускает gunicorn с разными классами воркеров и сравнивает '
+        'пропускную способность и задержки под конкурентной нагрузкой.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--worker-class', nargs='+',
+                            default=['sync', 'gthread'],
+                            help='Классы воркеров gunicorn для сравнения.')
+        parser.add_argument('--workers', type=int, default=2)
+        parser.add_argument('--threads', type=int, default=4)
+        parser.add_argument('--concurrency', type=int, default=16)
+        parser.add_argument('--requests', type=int, default=500)
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument('--path', nargs='+', default=DEFAULT_PATHS,
+                            help='Адреса для нагрузки.')
+
+    def handle(self, *args, **options):
+        base_url = f'http://127.0.0.1:{options["port"]}'
+        results = {}
+        for worker_class in options['worker_class']:
+            server = start_gunicorn(options['port'], worker_class,
+                                    options['workers'], options['threads'])
+            try:
+                wait_ready(server, base_url)
+                results[worker_class] = http_load(
+                    base_url, options['path'], options['requests'],
+                    options['concurrency']
+                )
+            except RuntimeError as error:
+                raise CommandError(error)
+            finally:
+                server.terminate()
+                server.wait()
+        self.stdout.write(json.dumps(results, indent=2))
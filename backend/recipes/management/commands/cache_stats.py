@@ -0,0 +1,28 @@
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from recipes.cache import (RESPONSE_CACHE_HITS, RESPONSE_CACHE_MISSES,
+                           get_response_cache_stats, is_process_local)
+
+
+class Command(BaseCommand):
+    help = 'Показывает попадания и промахи кэша ответов рецептов.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true',
+                            help='Обнулить счётчики после вывода.')
+
+    def handle(self, *args, **options):
+        if is_process_local():
+            raise CommandError(
+                'Кэш по умолчанию локальный для процесса (locmem): '
+                'счётчики воркеров отсюда не видны. Задайте общий кэш '
+                'через CACHE_URL или смотрите /api/health/cache/ '
+                'от имени администратора.'
+            )
+        stats = get_response_cache_stats()
+        self.stdout.write(
+            f'hits: {stats["hits"]}, misses: {stats["misses"]}, '
+            f'hit ratio: {stats["hit_ratio"]:.1%}'
+        )
+        if options['reset']:
+            cache.delete_many([RESPONSE_CACHE_HITS, RESPONSE_CACHE_MISSES])
@@ -0,0 +1,73 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Exists, OuterRef, Sum
+from recipes.models import (FavoriteRecipe, Ingredient, RecipeIngredient,
+                            ShoppingCart)
+from recipes.search import search_recipes
+from recipes.views import RecipeViewSet
+from users.models import Subscribe
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        'Печатает планы выполнения (EXPLAIN) запросов основных эндпоинтов, '
+        'чтобы проверить, что используются индексы.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help='Email пользователя для запросов.')
+        parser.add_argument('--analyze', action='store_true',
+                            help='Выполнить EXPLAIN ANALYZE (PostgreSQL).')
+
+    def get_queries(self, user):
+        recipes = RecipeViewSet.queryset.all()
+        page = slice(0, 6)
+        return {
+            'recipes: список': recipes[page],
+            'recipes: рецепты автора': recipes.filter(author=user)[page],
+            'recipes: фильтр по тегу': recipes.filter(
+                tags__slug__in=['breakfast']
+            ).distinct()[page],
+            'recipes: избранное': recipes.annotate(
+                is_favorited=Exists(FavoriteRecipe.objects.filter(
+                    user=user, recipe=OuterRef('pk')
+                ))
+            ).filter(is_favorited=True)[page],
+            'recipes: список покупок': recipes.annotate(
+                is_in_shopping_cart=Exists(ShoppingCart.objects.filter(
+                    user=user, recipe=OuterRef('pk')
+                ))
+            ).filter(is_in_shopping_cart=True)[page],
+            'recipes: download_shopping_cart': (
+                RecipeIngredient.objects
+                .filter(recipe__shopping_carts__user=user)
+                .values('ingredient__name', 'ingredient__measurement_unit')
+                .annotate(amount=Sum('amount'))
+                .order_by('ingredient__name')
+            ),
+            'recipes: поиск': search_recipes(recipes, 'курица')[page],
+            'users: subscriptions': User.objects.filter(
+                subscribing__user=user
+            )[page],
+            'users: подписчики автора': Subscribe.objects.filter(
+                author=user
+            ),
+            'ingredients: поиск по префиксу': Ingredient.objects.filter(
+                name__startswith='абр'
+            ),
+        }
+
+    def handle(self, *args, **options):
+        if options['user']:
+            user = User.objects.filter(email=options['user']).first()
+        else:
+            user = User.objects.order_by('id').first()
+        if user is None:
+            raise CommandError('Нет пользователя для построения запросов.')
+        explain_options = {'analyze': True} if options['analyze'] else {}
+        for title, queryset in self.get_queries(user).items():
+            self.stdout.write(self.style.MIGRATE_HEADING(title))
+            self.stdout.write(queryset.explain(**explain_options))
+            self.stdout.write('')
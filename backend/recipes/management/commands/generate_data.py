@@ -0,0 +1,173 @@
+import os
+import random
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from recipes.cache import INGREDIENTS_VERSION, RECIPES_VERSION, bump_version
+from recipes.counters import recount_all
+from recipes.images import schedule_thumbnails
+from recipes.management.commands import import_data
+from recipes.models import (FavoriteRecipe, Ingredient, Recipe,
+                            RecipeIngredient, ShoppingCart, Tag)
+from recipes.search import update_search_vectors
+from users.models import Subscribe
+
+User = get_user_model()
+
+BATCH_SIZE = 1000
+WORDS = (
+    'суп', 'салат', 'пирог', 'рагу', 'каша', 'запеканка', 'паста',
+    'омлет', 'плов', 'котлеты', 'блины', 'соус', 'бульон', 'жаркое',
+)
+ADJECTIVES = (
+    'домашний', 'быстрый', 'острый', 'летний', 'сытный', 'лёгкий',
+    'праздничный', 'овощной', 'сливочный', 'пряный',
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Генерирует синтетические данные для нагрузочного тестирования: '
+        'пользователей, рецепты, избранное, списки покупок и подписки.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--recipes', type=int, default=1000)
+        parser.add_argument('--ingredients-per-recipe', type=int, nargs=2,
+                            default=(3, 12), metavar=('MIN', 'MAX'))
+        parser.add_argument('--favorites', type=int, default=20,
+                            help='Избранных рецептов на пользователя.')
+        parser.add_argument('--carts', type=int, default=5,
+                            help='Рецептов в списке покупок пользователя.')
+        parser.add_argument('--subscriptions', type=int, default=10,
+                            help='Подписок на пользователя.')
+        parser.add_argument('--seed', type=int, default=0,
+                            help='Зерно генератора для воспроизводимости.')
+        parser.add_argument('--prefix', default='synthetic',
+                            help='Префикс email и username пользователей.')
+        parser.add_argument('--password', default='synthetic-password')
+
+    def ensure_catalog(self):
+        if not Ingredient.objects.exists():
+            import_data.ingredients_create(import_data.read_csv(
+                os.path.join(settings.BASE_DIR, 'data', 'ingredients.csv')
+            ))
+        if not Tag.objects.exists():
+            import_data.tags_create(import_data.read_json(
+                os.path.join(settings.BASE_DIR, 'data', 'tags.json')
+            ))
+        return (list(Ingredient.objects.values_list('id', flat=True)),
+                list(Tag.objects.values_list('id', flat=True)))
+
+    def create_users(self, options):
+        prefix = options['prefix']
+        if User.objects.filter(username__startswith=f'{prefix}-').exists():
+            raise CommandError(
+                f'Пользователи с префиксом {prefix} уже есть, '
+                'укажите другой --prefix.'
+            )
+        password = make_password(options['password'])
+        User.objects.bulk_create(
+            [User(email=f'{prefix}-{index}@example.com',
+                  username=f'{prefix}-{index}',
+                  first_name='Тест', last_name=str(index),
+                  password=password)
+             for index in range(options['users'])],
+            batch_size=BATCH_SIZE
+        )
+        return list(
+            User.objects
+            .filter(username__startswith=f'{prefix}-')
+            .values_list('id', flat=True)
+        )
+
+    def create_recipes(self, rng, options, user_ids, ingredient_ids,
+                       tag_ids):
+        image = default_storage.save(
+            'recipes/synthetic.png', import_data.placeholder_image('synthetic')
+        )
+        schedule_thumbnails(image)
+        last_id = Recipe.objects.order_by('-id').values_list(
+            'id', flat=True
+        ).first() or 0
+        Recipe.objects.bulk_create(
+            [Recipe(author_id=rng.choice(user_ids),
+                    name=(f'{rng.choice(ADJECTIVES).capitalize()} '
+                          f'{rng.choice(WORDS)} №{index}'),
+                    text=' '.join(rng.choices(WORDS + ADJECTIVES, k=40)),
+                    cooking_time=rng.randint(5, 180),
+                    image=image)
+             for index in range(options['recipes'])],
+            batch_size=BATCH_SIZE
+        )
+        recipe_ids = list(
+            Recipe.objects.filter(id__gt=last_id).values_list('id', flat=True)
+        )
+        low, high = options['ingredients_per_recipe']
+        high = min(high, len(ingredient_ids))
+        RecipeIngredient.objects.bulk_create(
+            (RecipeIngredient(recipe_id=recipe_id, ingredient_id=ingredient_id,
+                              amount=rng.randint(1, 500))
+             for recipe_id in recipe_ids
+             for ingredient_id in rng.sample(ingredient_ids,
+                                             rng.randint(min(low, high),
+                                                         high))),
+            batch_size=BATCH_SIZE
+        )
+        through = Recipe.tags.through
+        through.objects.bulk_create(
+            (through(recipe_id=recipe_id, tag_id=tag_id)
+             for recipe_id in recipe_ids
+             for tag_id in rng.sample(tag_ids, rng.randint(1, len(tag_ids)))),
+            batch_size=BATCH_SIZE
+        )
+        return recipe_ids
+
+    def create_links(self, rng, model, target_field, user_ids, targets,
+                     per_user, allow_self=True):
+        rows = []
+        for user_id in user_ids:
+            candidates = targets
+            if not allow_self:
+                candidates = [pk for pk in targets if pk != user_id]
+            for target_id in rng.sample(candidates,
+                                        min(per_user, len(candidates))):
+                rows.append(model(user_id=user_id,
+                                  **{f'{target_field}_id': target_id}))
+        model.objects.bulk_create(rows, batch_size=BATCH_SIZE,
+                                  ignore_conflicts=True)
+        return len(rows)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        started = time.perf_counter()
+        with transaction.atomic():
+            ingredient_ids, tag_ids = self.ensure_catalog()
+            user_ids = self.create_users(options)
+            recipe_ids = self.create_recipes(rng, options, user_ids,
+                                             ingredient_ids, tag_ids)
+            favorites = self.create_links(rng, FavoriteRecipe, 'recipe',
+                                          user_ids, recipe_ids,
+                                          options['favorites'])
+            carts = self.create_links(rng, ShoppingCart, 'recipe',
+                                      user_ids, recipe_ids, options['carts'])
+            subscriptions = self.create_links(
+                rng, Subscribe, 'author', user_ids, user_ids,
+                options['subscriptions'], allow_self=False
+            )
+            recount_all()
+            update_search_vectors(recipe_ids)
+            bump_version(INGREDIENTS_VERSION)
+            bump_version(RECIPES_VERSION)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Пользователей: {len(user_ids)}, рецептов: {len(recipe_ids)}, '
+            f'избранное: {favorites}, списки покупок: {carts}, '
+            f'подписки: {subscriptions} за {elapsed:.1f} с'
+        ))
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from recipes.images import generate_thumbnails
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = ('Создаёт миниатюры для картинок рецептов, у которых их ещё '
+            'нет (thumbnails_ready), или для всех с --all.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true',
+                            help='Пересоздать миниатюры всех рецептов.')
+
+    def handle(self, *args, **options):
+        recipes = Recipe.objects.exclude(image='')
+        if not options['all']:
+            recipes = recipes.filter(thumbnails_ready=False)
+        names = (
+            recipes.order_by().values_list('image', flat=True).distinct()
+        )
+        count = 0
+        for name in names.iterator():
+            try:
+                generate_thumbnails(name)
+            except (OSError, ValueError) as error:
+                self.stderr.write(f'{name}: {error}')
+                continue
+            count += 1
+        self.stdout.write(self.style.SUCCESS(f'Обработано картинок: {count}'))
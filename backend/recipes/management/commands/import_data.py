@@ -1,32 +1,199 @@
 import csv
+import io
+import json
 import os
+import time
+from itertools import islice
 
 from django.conf import settings
-from django.core.management.base import BaseCommand
-from recipes.models import Ingredient
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from PIL import Image
+from recipes.cache import INGREDIENTS_VERSION, bump_version
+from recipes.counters import change_counter
+from recipes.images import schedule_thumbnails
+from recipes.models import Ingredient, Recipe, RecipeIngredient, Tag
 
+User = get_user_model()
 
-def ingredient_create(row):
-    Ingredient.objects.get_or_create(
-        name=row[0],
-        measurement_unit=row[1],
+BATCH_SIZE = 1000
+
+
+def read_csv(path):
+    with open(path, "r", encoding="utf-8") as file:
+        for name, measurement_unit in csv.reader(file):
+            yield {"name": name, "measurement_unit": measurement_unit}
+
+
+def read_json(path):
+    with open(path, "r", encoding="utf-8") as file:
+        yield from json.load(file)
+
+
+def batched(rows, size=BATCH_SIZE):
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, size))
+        if not batch:
+            return
+        yield batch
+
+
+def copy_ingredients(rows):
+    """
+    Загружает ингредиенты через COPY во временную таблицу и переносит
+    их в основную одним INSERT ... ON CONFLICT DO UPDATE.
+    """
+    table = Ingredient._meta.db_table
+    count = 0
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "CREATE TEMP TABLE ingredient_staging "
+            "(name varchar(100), measurement_unit varchar(100)) "
+            "ON COMMIT DROP"
+        )
+        for batch in batched(rows):
+            buffer = io.StringIO()
+            csv.writer(buffer).writerows(
+                (row["name"], row["measurement_unit"]) for row in batch
+            )
+            buffer.seek(0)
+            cursor.copy_expert(
+                "COPY ingredient_staging FROM STDIN WITH (FORMAT csv)", buffer
+            )
+            count += len(batch)
+        cursor.execute(
+            f"INSERT INTO {table} (name, measurement_unit) "
+            "SELECT DISTINCT ON (name) name, measurement_unit "
+            "FROM ingredient_staging "
+            "ON CONFLICT (name) DO UPDATE "
+            "SET measurement_unit = EXCLUDED.measurement_unit"
+        )
+    return count
+
+
+def bulk_create_ingredients(rows):
+    count = 0
+    for batch in batched(rows):
+        Ingredient.objects.bulk_create(
+            [Ingredient(**row) for row in batch], ignore_conflicts=True
+        )
+        count += len(batch)
+    return count
+
+
+def ingredients_create(rows):
+    if connection.vendor == "postgresql":
+        count = copy_ingredients(rows)
+    else:
+        count = bulk_create_ingredients(rows)
+    bump_version(INGREDIENTS_VERSION)
+    return count
+
+
+def tags_create(rows):
+    count = 0
+    for row in rows:
+        Tag.objects.update_or_create(slug=row["slug"], defaults=row)
+        count += 1
+    return count
+
+
+def placeholder_image(name):
+    buffer = io.BytesIO()
+    Image.new("RGB", (480, 320), "#f0e6d2").save(buffer, format="PNG")
+    return ContentFile(buffer.getvalue(), name=f"{name}.png")
+
+
+def recipes_create(rows):
+    """
+    Создаёт демонстрационные рецепты. Рецепт с тем же автором и
+    названием пропускается, поэтому повторный запуск ничего не дублирует.
+    """
+    rows = list(rows)
+    ingredient_ids = dict(
+        Ingredient.objects.filter(
+            name__in={
+                item["name"] for row in rows for item in row["ingredients"]
+            }
+        ).values_list("name", "id")
     )
+    tag_ids = dict(Tag.objects.values_list("slug", "id"))
+    count = 0
+    for row in rows:
+        author_data = dict(row["author"])
+        author, created = User.objects.get_or_create(
+            email=author_data.pop("email"), defaults=author_data
+        )
+        if created:
+            author.set_unusable_password()
+            author.save(update_fields=["password"])
+        if Recipe.objects.filter(author=author, name=row["name"]).exists():
+            continue
+        missing = [
+            item["name"] for item in row["ingredients"]
+            if item["name"] not in ingredient_ids
+        ]
+        if missing:
+            raise CommandError(
+                f"Ингредиенты для рецепта '{row['name']}' "
+                f"не найдены: {', '.join(missing)}"
+            )
+        recipe = Recipe.objects.create(
+            author=author,
+            name=row["name"],
+            text=row["text"],
+            cooking_time=row["cooking_time"],
+            image=placeholder_image(f"demo-{author.id}-{count}"),
+        )
+        schedule_thumbnails(recipe.image.name)
+        recipe.tags.set([tag_ids[slug] for slug in row["tags"]])
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(
+                recipe=recipe,
+                ingredient_id=ingredient_ids[item["name"]],
+                amount=item["amount"],
+            )
+            for item in row["ingredients"]
+        )
+        change_counter(User.objects.filter(pk=author.pk), "recipes_count", 1)
+        count += 1
+    return count
 
 
 action = {
-    "ingredients.csv": ingredient_create,
+    "ingredients.csv": (read_csv, ingredients_create),
+    "ingredients.json": (read_json, ingredients_create),
+    "tags.json": (read_json, tags_create),
+    "recipes.json": (read_json, recipes_create),
 }
 
 
 class Command(BaseCommand):
+    help = (
+        "Загружает данные из каталога data/. Поддерживаются файлы: "
+        + ", ".join(action)
+    )
+
     def add_arguments(self, parser):
         parser.add_argument("filename", nargs="+", type=str)
 
     def handle(self, *args, **options):
         for filename in options["filename"]:
+            if filename not in action:
+                raise CommandError(
+                    f"Неизвестный файл {filename}. "
+                    f"Поддерживаются: {', '.join(action)}"
+                )
             path = os.path.join(settings.BASE_DIR, "data/") + filename
-            with open(path, "r", encoding="utf-8") as file:
-                reader = csv.reader(file)
-                next(reader)
-                for row in reader:
-                    action[filename](row)
+            reader, loader = action[filename]
+            started = time.perf_counter()
+            with transaction.atomic():
+                count = loader(reader(path))
+            elapsed = time.perf_counter() - started
+            self.stdout.write(self.style.SUCCESS(
+                f"{filename}: {count} строк за {elapsed:.2f} с "
+                f"({count / max(elapsed, 1e-6):.0f} строк/с)"
+            ))
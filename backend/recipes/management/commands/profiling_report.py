@@ -0,0 +1,77 @@
+import json
+import sys
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand, CommandError
+from recipes.benchmark import percentile
+
+
+def read_records(lines):
+    for line in lines:
+        start = line.find('{')
+        if start == -1:
+            continue
+        try:
+            record = json.loads(line[start:])
+        except ValueError:
+            continue
+        if 'total_ms' in record:
+            yield record
+
+
+class Command(BaseCommand):
+    help = (
+        'Сводит лог ProfilingMiddleware: p50/p95/p99 времени ответа, '
+        'время SQL и число запросов для каждого представления.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('logfile', nargs='?', default='-',
+                            help='Файл лога; "-" читает stdin.')
+        parser.add_argument('--json', action='store_true',
+                            help='Вывести результат в JSON.')
+
+    def aggregate(self, records):
+        groups = defaultdict(list)
+        for record in records:
+            groups[(record['method'], record['view'])].append(record)
+        report = []
+        for (method, view), items in groups.items():
+            total = sorted(item['total_ms'] for item in items)
+            sql = sorted(item['sql_ms'] for item in items)
+            queries = [item['queries'] for item in items]
+            report.append({
+                'view': f'{method} {view}',
+                'requests': len(items),
+                'p50_ms': percentile(total, 50),
+                'p95_ms': percentile(total, 95),
+                'p99_ms': percentile(total, 99),
+                'sql_p95_ms': percentile(sql, 95),
+                'queries_avg': round(sum(queries) / len(queries), 1),
+                'queries_max': max(queries),
+                'with_duplicates': sum(
+                    1 for item in items if item.get('duplicates')
+                ),
+            })
+        return sorted(report, key=lambda row: row['p95_ms'], reverse=True)
+
+    def handle(self, *args, **options):
+        if options['logfile'] == '-':
+            report = self.aggregate(read_records(sys.stdin))
+        else:
+            try:
+                with open(options['logfile'], encoding='utf-8') as file:
+                    report = self.aggregate(read_records(file))
+            except OSError as error:
+                raise CommandError(error)
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2,
+                                         ensure_ascii=False))
+            return
+        columns = ('view', 'requests', 'p50_ms', 'p95_ms', 'p99_ms',
+                   'sql_p95_ms', 'queries_avg', 'queries_max',
+                   'with_duplicates')
+        self.stdout.write('\t'.join(columns))
+        for row in report:
+            self.stdout.write('\t'.join(str(row[column])
+                                        for column in columns))
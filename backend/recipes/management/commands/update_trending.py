@@ -0,0 +1,107 @@
+from collections import defaultdict
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F, Max, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from recipes.cache import RECIPES_VERSION, bump_version
+from recipes.models import FavoriteRecipe, Recipe, RecipeTrend, ShoppingCart
+
+EVENT_WEIGHTS = {
+    FavoriteRecipe: 1.0,
+    ShoppingCart: 0.5,
+}
+MIN_SCORE = 1e-3
+
+
+def sync_trending_scores():
+    """
+    Копирует рейтинги в Recipe.trending_score одним UPDATE, чтобы
+    сортировка trending шла по индексу таблицы рецептов.
+    """
+    return Recipe.objects.filter(
+        Q(trend__isnull=False) | ~Q(trending_score=0)
+    ).update(
+        trending_score=Coalesce(
+            Subquery(
+                RecipeTrend.objects
+                .filter(recipe=OuterRef('pk'))
+                .values('score')
+            ),
+            0.0
+        )
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        'Инкрементально пересчитывает рейтинг trending: старые значения '
+        'затухают, новые события избранного и списка покупок добавляются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--half-life', type=float, default=72,
+                            help='Период полураспада рейтинга в часах.')
+        parser.add_argument('--window', type=int, default=14,
+                            help='Сколько дней событий учитывать '
+                                 'при полном пересчёте.')
+        parser.add_argument('--rebuild', action='store_true',
+                            help='Удалить рейтинги и пересчитать заново.')
+
+    def decay(self, seconds, half_life):
+        return 0.5 ** (seconds / half_life)
+
+    @transaction.atomic
+    def handle(self, *args, **options):
+        now = timezone.now()
+        half_life = options['half_life'] * 3600
+        if options['rebuild']:
+            RecipeTrend.objects.all().delete()
+        since = RecipeTrend.objects.aggregate(
+            last=Max('updated_at')
+        )['last']
+        if since is None:
+            since = now - timedelta(days=options['window'])
+        else:
+            RecipeTrend.objects.update(
+                score=F('score') * self.decay(
+                    (now - since).total_seconds(), half_life
+                ),
+                updated_at=now,
+            )
+
+        scores = defaultdict(float)
+        events = 0
+        for model, weight in EVENT_WEIGHTS.items():
+            rows = (
+                model.objects
+                .filter(created_at__gt=since, created_at__lte=now)
+                .values_list('recipe_id', 'created_at')
+            )
+            for recipe_id, created_at in rows.iterator():
+                scores[recipe_id] += weight * self.decay(
+                    (now - created_at).total_seconds(), half_life
+                )
+                events += 1
+
+        existing = RecipeTrend.objects.in_bulk(list(scores))
+        for recipe_id, trend in existing.items():
+            trend.score += scores[recipe_id]
+        RecipeTrend.objects.bulk_update(existing.values(), ['score'],
+                                        batch_size=1000)
+        RecipeTrend.objects.bulk_create(
+            [RecipeTrend(recipe_id=recipe_id, score=score, updated_at=now)
+             for recipe_id, score in scores.items()
+             if recipe_id not in existing],
+            batch_size=1000
+        )
+        removed, _ = RecipeTrend.objects.filter(score__lt=MIN_SCORE).delete()
+        sync_trending_scores()
+        # Ответы с ordering=trending в кэше построены по старым рейтингам.
+        bump_version(RECIPES_VERSION)
+        self.stdout.write(self.style.SUCCESS(
+            f'Событий: {events}, рецептов с рейтингом: {len(scores)}, '
+            f'удалено затухших: {removed}'
+        ))
@@ -0,0 +1,38 @@
+# Generated by Django 3.2.3 on 2026-10-17 06:20
+
+from django.db import migrations
+
+INDEXES = (
+    ('ingredient_name_pattern_idx',
+     'ON recipes_ingredient (name varchar_pattern_ops)'),
+    ('ingredient_name_trgm_idx',
+     'ON recipes_ingredient USING gin (name gin_trgm_ops)'),
+)
+
+
+def create_indexes(apps, schema_editor):
+    # Классы операторов и pg_trgm есть только в PostgreSQL; на других
+    # СУБД поиск ингредиентов работает без этих индексов.
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for name, definition in INDEXES:
+        schema_editor.execute(f'CREATE INDEX IF NOT EXISTS {name} {definition}')
+
+
+def drop_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, _ in INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0003_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
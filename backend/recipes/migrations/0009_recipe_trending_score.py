@@ -0,0 +1,34 @@
+# Generated by Django 3.2.3 on 2026-10-17 06:41
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def copy_trending_scores(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    RecipeTrend = apps.get_model('recipes', 'RecipeTrend')
+    Recipe.objects.filter(trend__isnull=False).update(
+        trending_score=Subquery(
+            RecipeTrend.objects.filter(recipe=OuterRef('pk')).values('score')
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0008_data_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='trending_score',
+            field=models.FloatField(default=0, editable=False, verbose_name='Рейтинг trending'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['-trending_score', '-created_at'], name='recipe_trending_idx'),
+        ),
+        migrations.RunPython(copy_trending_scores, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,123 @@
+import time
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+from foodgram.middleware import current_profile
+from recipes.cache import (RESPONSE_CACHE_HITS, RESPONSE_CACHE_MISSES,
+                           get_version, get_version_info, incr_counter,
+                           response_cache_key)
+from rest_framework.response import Response
+
+
+class ConditionalGetMixin:
+    """
+    Условные GET-запросы для редко меняющихся справочников.
+    ETag и Last-Modified строятся по версии таблицы (один запрос по
+    первичному ключу), поэтому ответ 304 отдаётся до аутентификации,
+    выборки данных и сериализации. Прочитанная версия сохраняется
+    в data_version, чтобы представление не запрашивало её повторно.
+    """
+    version_key = None
+    data_version = None
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return super().dispatch(request, *args, **kwargs)
+        version, last_modified = get_version_info(self.version_key)
+        self.data_version = version
+        etag = quote_etag(f'{self.version_key}:{version}')
+        last_modified = int(last_modified)
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if response is None:
+            response = super().dispatch(request, *args, **kwargs)
+        if response.status_code in (200, 304):
+            response['ETag'] = etag
+            response['Last-Modified'] = http_date(last_modified)
+            patch_cache_control(response, public=True,
+                                max_age=settings.CATALOG_CACHE_MAX_AGE)
+        return response
+
+    def perform_authentication(self, request):
+        # Справочники не зависят от пользователя: токен проверяется
+        # лениво, только если к request.user всё же обратятся.
+        pass
+
+
+class AnonymousCacheMixin:
+    """
+    Кэширует ответы list и retrieve для анонимных пользователей.
+    В ключ входит версия данных, поэтому после любого изменения рецептов
+    старые ответы перестают находиться и вытесняются по таймауту.
+    """
+    version_key = None
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(super().retrieve, request,
+                                    *args, **kwargs)
+
+    def is_cacheable(self, request):
+        return not request.user.is_authenticated
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        if not self.is_cacheable(request):
+            return handler(request, *args, **kwargs)
+        key = response_cache_key(request, f'response:{self.version_key}',
+                                 get_version(self.version_key))
+        data = cache.get(key)
+        if data is not None:
+            incr_counter(RESPONSE_CACHE_HITS)
+            response = Response(data)
+            response['X-Cache'] = 'HIT'
+            return response
+        incr_counter(RESPONSE_CACHE_MISSES)
+        response = handler(request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(key, response.data, settings.RESPONSE_CACHE_TIMEOUT)
+        response['X-Cache'] = 'MISS'
+        return response
+
+
+@lru_cache(maxsize=None)
+def timed_serializer_class(serializer_class):
+    class TimedSerializer(serializer_class):
+        @property
+        def data(self):
+            profile = current_profile()
+            started = time.perf_counter()
+            try:
+                return super().data
+            finally:
+                if profile is not None:
+                    profile.serializer_time += (time.perf_counter()
+                                                - started)
+
+    TimedSerializer.__name__ = serializer_class.__name__
+    TimedSerializer.__qualname__ = serializer_class.__qualname__
+    return TimedSerializer
+
+
+class SerializerTimingMixin:
+    """
+    Замеряет время сериализации для ProfilingMiddleware. Класс
+    меняется только у сериализатора, созданного get_serializer (или
+    переданного в timed) в профилируемом запросе; остальные
+    сериализаторы процесса не затрагиваются.
+    """
+
+    def get_serializer(self, *args, **kwargs):
+        return self.timed(super().get_serializer(*args, **kwargs))
+
+    @staticmethod
+    def timed(serializer):
+        # Для сериализаторов, созданных в представлении напрямую.
+        if current_profile() is not None:
+            serializer.__class__ = timed_serializer_class(type(serializer))
+        return serializer
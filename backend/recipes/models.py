@@ -1,4 +1,5 @@
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MinValueValidator
 from django.db import models
 from django.db.models import UniqueConstraint
@@ -85,11 +86,36 @@ class Recipe(CreatedAtAbstractModel):
     tags = models.ManyToManyField(verbose_name='Теги',
                                   related_name='recipes',
                                   to='Tag')
+    favorites_count = models.PositiveIntegerField(
+        verbose_name='В избранном', default=0, editable=False
+    )
+    in_carts_count = models.PositiveIntegerField(
+        verbose_name='В списках покупок', default=0, editable=False
+    )
+    trending_score = models.FloatField(
+        verbose_name='Рейтинг trending', default=0, editable=False
+    )
+    thumbnails_ready = models.BooleanField(
+        verbose_name='Миниатюры созданы', default=False, editable=False
+    )
+    search_vector = SearchVectorField(null=True, editable=False)
 
     class Meta:
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
         ordering = ('-created_at',)
+        indexes = (
+            models.Index(fields=('-created_at', '-id'),
+                         name='recipe_created_at_id_idx'),
+            models.Index(fields=('author', '-created_at'),
+                         name='recipe_author_created_at_idx'),
+            models.Index(fields=('-favorites_count', '-created_at'),
+                         name='recipe_popular_idx'),
+            models.Index(fields=('cooking_time', '-created_at'),
+                         name='recipe_cooking_time_idx'),
+            models.Index(fields=('-trending_score', '-created_at'),
+                         name='recipe_trending_idx'),
+        )
 
     def __str__(self) -> str:
         return str(self.name)
@@ -147,6 +173,10 @@ class FavoriteRecipe(CreatedAtAbstractModel):
             UniqueConstraint(fields=['user', 'recipe'],
                              name='unique_favorite')
         ]
+        indexes = [
+            models.Index(fields=['user', '-created_at'], include=['recipe'],
+                         name='favorite_user_created_at_idx')
+        ]
 
     def __str__(self) -> str:
         return f'{self.user} - [{self.recipe.name}]'
@@ -170,7 +200,56 @@ class ShoppingCart(CreatedAtAbstractModel):
             UniqueConstraint(fields=['user', 'recipe'],
                              name='unique_shopping_cart')
         ]
+        indexes = [
+            models.Index(fields=['user', '-created_at'], include=['recipe'],
+                         name='cart_user_created_at_idx')
+        ]
 
     def __str__(self) -> str:
         return (f'[{self.created_at.strftime("%d.%m.%Y %H:%M")}] '
                 f'{self.user}: {self.recipe.name}')
+
+
+class RecipeTrend(models.Model):
+    """
+    Рейтинг популярности рецепта с затуханием по времени.
+    Пересчитывается периодически командой update_trending
+    по событиям добавления в избранное и в список покупок
+    и копируется в Recipe.trending_score для сортировки по индексу.
+    """
+    recipe = models.OneToOneField(verbose_name='Рецепт', to='Recipe',
+                                  on_delete=models.CASCADE,
+                                  primary_key=True, related_name='trend')
+    score = models.FloatField(verbose_name='Рейтинг', default=0)
+    updated_at = models.DateTimeField(verbose_name='Дата пересчёта')
+
+    class Meta:
+        verbose_name = 'Рейтинг рецепта'
+        verbose_name_plural = 'Рейтинги рецептов'
+        indexes = [
+            models.Index(fields=['-score'], name='recipe_trend_score_idx'),
+        ]
+
+    def __str__(self) -> str:
+        return f'{self.recipe_id}: {self.score:.3f}'
+
+
+class DataVersion(models.Model):
+    """
+    Версия набора данных (рецепты, ингредиенты, теги) для ключей кэша
+    и условных запросов. Хранится в БД, чтобы все воркеры видели
+    одно и то же значение.
+    """
+    key = models.CharField(verbose_name='Ключ', max_length=50,
+                           primary_key=True)
+    version = models.PositiveBigIntegerField(verbose_name='Версия',
+                                             default=0)
+    modified = models.DateTimeField(verbose_name='Дата изменения',
+                                    auto_now=True)
+
+    class Meta:
+        verbose_name = 'Версия данных'
+        verbose_name_plural = 'Версии данных'
+
+    def __str__(self) -> str:
+        return f'{self.key}: {self.version}'
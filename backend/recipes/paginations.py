@@ -1,6 +1,138 @@
-from rest_framework.pagination import PageNumberPagination
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import (Cursor, CursorPagination,
+                                       PageNumberPagination, _reverse_ordering)
 
 
 class CustomPagination(PageNumberPagination):
     page_size_query_param = "limit"
     page_size = 6
+
+
+def keyset_filter(ordering, position, reverse=False):
+    """
+    Условие «строго после position» для составного порядка:
+    (a, b, c) > (x, y, z) раскрывается в
+    a > x OR (a = x AND b > y) OR (a = x AND b = y AND c > z),
+    поэтому направления полей могут различаться. Отдельное условие
+    a >= x на первое поле позволяет базе начать с диапазона индекса.
+    """
+    condition = Q()
+    equal = {}
+    for field, value in zip(ordering, position):
+        name = field.lstrip('-')
+        lookup = 'lt' if field.startswith('-') != reverse else 'gt'
+        condition |= Q(**equal, **{f'{name}__{lookup}': value})
+        equal[name] = value
+    first = ordering[0]
+    lookup = 'lte' if first.startswith('-') != reverse else 'gte'
+    return Q(**{f'{first.lstrip("-")}__{lookup}': position[0]}) & condition
+
+
+class CustomCursorPagination(CursorPagination):
+    """
+    Курсорная пагинация по ключу из всех полей порядка (keyset).
+    Стандартный CursorPagination запоминает только первое поле и при
+    совпадениях значений переходит на OFFSET, а у популярных и
+    трендовых рецептов совпадения — норма (нули). Здесь курсор хранит
+    значения всех полей, порядок должен состоять из полей без NULL
+    и заканчиваться уникальным полем (id), и страница всегда
+    выбирается без OFFSET.
+    """
+    page_size_query_param = "limit"
+    page_size = 6
+    ordering = ('-created_at', '-id')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+        reverse, position = (
+            (False, None) if self.cursor is None
+            else (self.cursor.reverse, self.cursor.position)
+        )
+        if reverse:
+            queryset = queryset.order_by(*_reverse_ordering(self.ordering))
+        else:
+            queryset = queryset.order_by(*self.ordering)
+        if position is not None:
+            try:
+                values = json.loads(position)
+                if len(values) != len(self.ordering):
+                    raise ValueError
+                queryset = queryset.filter(
+                    keyset_filter(self.ordering, values, reverse)
+                )
+            except (TypeError, ValueError, ValidationError):
+                raise NotFound(self.invalid_cursor_message)
+
+        results = list(queryset[:self.page_size + 1])
+        self.page = results[:self.page_size]
+        has_more = len(results) > self.page_size
+        if reverse:
+            self.page.reverse()
+        self.has_next = position is not None if reverse else has_more
+        self.has_previous = has_more if reverse else position is not None
+        # Для пустой страницы ссылки строятся от позиции из курсора.
+        self.next_position = self.previous_position = position
+        if (self.has_previous or self.has_next) and self.template:
+            self.display_page_controls = True
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        position = self.next_position
+        if self.page:
+            position = self._get_position_from_instance(self.page[-1],
+                                                        self.ordering)
+        return self.encode_cursor(Cursor(0, False, position))
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        position = self.previous_position
+        if self.page:
+            position = self._get_position_from_instance(self.page[0],
+                                                        self.ordering)
+        return self.encode_cursor(Cursor(0, True, position))
+
+    def _get_position_from_instance(self, instance, ordering):
+        return json.dumps([
+            str(getattr(instance, field.lstrip('-'))) for field in ordering
+        ])
+
+
+class FeedPagination(CustomPagination):
+    """
+    Пагинация лент: по умолчанию номера страниц, а с параметром
+    ?pagination=cursor (или уже полученным cursor) — курсорная пагинация
+    без OFFSET и COUNT(*). Порядок курсора задаётся атрибутом
+    cursor_ordering у представления.
+    """
+    cursor_pagination_class = CustomCursorPagination
+    cursor_paginator = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        params = request.query_params
+        if (params.get('pagination') != 'cursor'
+                and self.cursor_pagination_class.cursor_query_param
+                not in params):
+            return super().paginate_queryset(queryset, request, view)
+        self.cursor_paginator = self.cursor_pagination_class()
+        self.cursor_paginator.ordering = getattr(
+            view, 'cursor_ordering', self.cursor_paginator.ordering
+        )
+        return self.cursor_paginator.paginate_queryset(queryset, request,
+                                                       view)
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
@@ -0,0 +1,232 @@
+from django.db import connection, transaction
+from recipes.counters import change_counter
+
+
+def _sql_parts(relation, target_field):
+    target_model = relation._meta.get_field(target_field).related_model
+    user_column = relation._meta.get_field('user').column
+    target_column = relation._meta.get_field(target_field).column
+    return (target_model, relation._meta.db_table,
+            target_model._meta.db_table, user_column, target_column)
+
+
+def add_relation(relation, target_field, counter_field, user, target_id,
+                 allow_self=True):
+    """
+    Создаёт связь пользователя с объектом (избранное, список покупок,
+    подписка) и увеличивает счётчик объекта. В PostgreSQL это один
+    запрос: INSERT ... ON CONFLICT DO NOTHING RETURNING внутри CTE и
+    UPDATE ... RETURNING объекта. Возвращает объект или None, если связь
+    уже была, объекта нет или это связь пользователя с самим собой.
+    """
+    target_model, table, target_table, user_column, target_column = (
+        _sql_parts(relation, target_field)
+    )
+    if connection.vendor != 'postgresql':
+        return _add_relation_orm(relation, target_model, target_field,
+                                 counter_field, user, target_id, allow_self)
+    columns = [user_column, target_column]
+    values = ['%s', 'id']
+    if any(field.name == 'created_at' for field in relation._meta.fields):
+        columns.append('created_at')
+        values.append('NOW()')
+    params = [user.pk, target_id]
+    self_condition = ''
+    if not allow_self:
+        self_condition = ' AND id <> %s'
+        params.append(user.pk)
+    sql = (
+        f'WITH inserted AS ('
+        f'INSERT INTO {table} ({", ".join(columns)}) '
+        f'SELECT {", ".join(values)} FROM {target_table} '
+        f'WHERE id = %s{self_condition} '
+        f'ON CONFLICT DO NOTHING '
+        f'RETURNING {target_column}'
+        f') '
+        f'UPDATE {target_table} SET {counter_field} = {counter_field} + 1 '
+        f'WHERE id IN (SELECT {target_column} FROM inserted) '
+        f'RETURNING *'
+    )
+    return next(iter(target_model.objects.raw(sql, params)), None)
+
+
+def _add_relation_orm(relation, target_model, target_field, counter_field,
+                      user, target_id, allow_self):
+    with transaction.atomic():
+        target = target_model.objects.filter(pk=target_id).first()
+        if target is None or (not allow_self and target.pk == user.pk):
+            return None
+        _, created = relation.objects.get_or_create(
+            user=user, **{target_field: target}
+        )
+        if not created:
+            return None
+        change_counter(target_model.objects.filter(pk=target.pk),
+                       counter_field, 1)
+        setattr(target, counter_field, getattr(target, counter_field) + 1)
+        return target
+
+
+def remove_relation(relation, target_field, counter_field, user, target_id):
+    """
+    Удаляет связь и уменьшает счётчик объекта. В PostgreSQL это один
+    запрос: DELETE ... RETURNING внутри CTE и UPDATE объекта.
+    Возвращает True, если связь существовала.
+    """
+    target_model, table, target_table, user_column, target_column = (
+        _sql_parts(relation, target_field)
+    )
+    if connection.vendor != 'postgresql':
+        with transaction.atomic():
+            deleted, _ = relation.objects.filter(
+                user=user, **{target_field: target_id}
+            ).delete()
+            if deleted:
+                change_counter(target_model.objects.filter(pk=target_id),
+                               counter_field, -1)
+        return bool(deleted)
+    sql = (
+        f'WITH deleted AS ('
+        f'DELETE FROM {table} '
+        f'WHERE {user_column} = %s AND {target_column} = %s '
+        f'RETURNING {target_column}'
+        f') '
+        f'UPDATE {target_table} '
+        f'SET {counter_field} = GREATEST({counter_field} - 1, 0) '
+        f'WHERE id IN (SELECT {target_column} FROM deleted)'
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [user.pk, target_id])
+        return cursor.rowcount > 0
+
+
+def _batch_add_sql(relation, target_field, counter_field, user, ids,
+                   allow_self):
+    target_model, table, target_table, user_column, target_column = (
+        _sql_parts(relation, target_field)
+    )
+    columns = [user_column, target_column]
+    values = ['%s', 'id']
+    if any(field.name == 'created_at' for field in relation._meta.fields):
+        columns.append('created_at')
+        values.append('NOW()')
+    params = [user.pk, ids]
+    self_condition = ''
+    if not allow_self:
+        self_condition = ' WHERE id <> %s'
+        params.append(user.pk)
+    sql = (
+        f'WITH inserted AS ('
+        f'INSERT INTO {table} ({", ".join(columns)}) '
+        f'SELECT {", ".join(values)} FROM {target_table} '
+        f'JOIN unnest(%s) AS batch(id) USING (id){self_condition} '
+        f'ON CONFLICT DO NOTHING '
+        f'RETURNING {target_column}'
+        f') '
+        f'UPDATE {target_table} SET {counter_field} = {counter_field} + 1 '
+        f'WHERE id IN (SELECT {target_column} FROM inserted) '
+        f'RETURNING id'
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return {row[0] for row in cursor.fetchall()}
+
+
+def _batch_remove_sql(relation, target_field, counter_field, user, ids):
+    target_model, table, target_table, user_column, target_column = (
+        _sql_parts(relation, target_field)
+    )
+    sql = (
+        f'WITH deleted AS ('
+        f'DELETE FROM {table} '
+        f'WHERE {user_column} = %s '
+        f'AND {target_column} IN (SELECT unnest(%s)) '
+        f'RETURNING {target_column}'
+        f') '
+        f'UPDATE {target_table} '
+        f'SET {counter_field} = GREATEST({counter_field} - 1, 0) '
+        f'WHERE id IN (SELECT {target_column} FROM deleted) '
+        f'RETURNING id'
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [user.pk, ids])
+        return {row[0] for row in cursor.fetchall()}
+
+
+def _batch_orm(relation, target_field, counter_field, user, add, remove):
+    target_model = relation._meta.get_field(target_field).related_model
+    target_column = relation._meta.get_field(target_field).attname
+    added, removed = set(), set()
+    for pk in add:
+        _, created = relation.objects.get_or_create(
+            user=user, **{target_column: pk}
+        )
+        if created:
+            added.add(pk)
+    for pk in remove:
+        deleted, _ = relation.objects.filter(
+            user=user, **{target_column: pk}
+        ).delete()
+        if deleted:
+            removed.add(pk)
+    change_counter(target_model.objects.filter(pk__in=added),
+                   counter_field, 1)
+    change_counter(target_model.objects.filter(pk__in=removed),
+                   counter_field, -1)
+    return added, removed
+
+
+def batch_relations(relation, target_field, counter_field, user,
+                    add=(), remove=(), allow_self=True):
+    """
+    Применяет пачку добавлений и удалений связей. Счётчики меняются
+    только для строк, которые действительно вставлены или удалены:
+    в PostgreSQL — INSERT ... ON CONFLICT DO NOTHING RETURNING и
+    DELETE ... RETURNING внутри CTE с UPDATE счётчиков, по одному
+    запросу на добавление и удаление. Возвращает статус для каждого id
+    и id объектов, связанных с пользователем после операции, среди
+    запрошенных к добавлению.
+    """
+    target_model = relation._meta.get_field(target_field).related_model
+    add, remove = set(add), set(remove)
+    with transaction.atomic():
+        found = set(
+            target_model.objects
+            .filter(pk__in=add | remove)
+            .values_list('pk', flat=True)
+        )
+        to_add = add & found
+        if not allow_self:
+            to_add.discard(user.pk)
+        to_remove = remove & found
+        if connection.vendor == 'postgresql':
+            added = removed = set()
+            if to_add:
+                added = _batch_add_sql(relation, target_field,
+                                       counter_field, user,
+                                       sorted(to_add), allow_self)
+            if to_remove - to_add:
+                removed = _batch_remove_sql(relation, target_field,
+                                            counter_field, user,
+                                            sorted(to_remove - to_add))
+        else:
+            added, removed = _batch_orm(relation, target_field,
+                                        counter_field, user,
+                                        sorted(to_add),
+                                        sorted(to_remove - to_add))
+
+    statuses = []
+    for pk in sorted(add):
+        if pk not in found:
+            status = 'not_found'
+        elif not allow_self and pk == user.pk:
+            status = 'self'
+        elif pk in added:
+            status = 'added'
+        else:
+            status = 'exists'
+        statuses.append({'id': pk, 'action': 'add', 'status': status})
+    for pk in sorted(remove):
+        status = 'removed' if pk in removed else 'absent'
+        statuses.append({'id': pk, 'action': 'remove', 'status': status})
+    return statuses, to_add
@@ -0,0 +1,133 @@
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connection, transaction
+from django.db.models import (Case, Exists, F, Func, IntegerField, OuterRef, Q,
+                              When)
+from recipes.models import Recipe, RecipeIngredient
+
+SEARCH_CONFIG = 'russian'
+
+
+def update_search_vectors(recipe_ids=None):
+    """
+    Пересчитывает поисковый вектор рецептов: название (вес A),
+    ингредиенты (вес B) и описание (вес C). Без recipe_ids
+    пересчитываются все рецепты. Вне PostgreSQL ничего не делает.
+    """
+    if connection.vendor != 'postgresql':
+        return
+    recipe_table = Recipe._meta.db_table
+    through_table = RecipeIngredient._meta.db_table
+    ingredient_table = (
+        RecipeIngredient._meta.get_field('ingredient')
+        .related_model._meta.db_table
+    )
+    sql = (
+        f'UPDATE {recipe_table} AS recipe SET search_vector = '
+        f"setweight(to_tsvector(%s, recipe.name), 'A') || "
+        f'setweight(to_tsvector(%s, coalesce(('
+        f"SELECT string_agg(ingredient.name, ' ') "
+        f'FROM {through_table} AS item '
+        f'JOIN {ingredient_table} AS ingredient '
+        f'ON ingredient.id = item.ingredient_id '
+        f'WHERE item.recipe_id = recipe.id'
+        f"), '')), 'B') || "
+        f"setweight(to_tsvector(%s, recipe.text), 'C')"
+    )
+    params = [SEARCH_CONFIG] * 3
+    if recipe_ids is not None:
+        recipe_ids = list(recipe_ids)
+        if not recipe_ids:
+            return
+        sql += ' WHERE recipe.id = ANY(%s)'
+        params.append(recipe_ids)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+
+
+def schedule_search_update(recipe_ids):
+    """
+    Пересчитывает поисковые векторы после фиксации транзакции, когда
+    ингредиенты рецепта уже записаны. id копятся в соединении, и первый
+    обработчик после фиксации пересчитывает их все одним UPDATE, поэтому
+    несколько сигналов за одно сохранение не пересчитывают вектор
+    повторно.
+    """
+    pending = getattr(connection, '_search_update_ids', None)
+    if pending is None:
+        pending = connection._search_update_ids = set()
+    pending.update(recipe_ids)
+    transaction.on_commit(flush_search_updates)
+
+
+def flush_search_updates():
+    pending = getattr(connection, '_search_update_ids', None)
+    if not pending:
+        return
+    recipe_ids = sorted(pending)
+    pending.clear()
+    update_search_vectors(recipe_ids)
+
+
+def postgres_search(queryset, value):
+    query = SearchQuery(value, config=SEARCH_CONFIG,
+                        search_type='websearch')
+    return (
+        queryset
+        .filter(search_vector=query)
+        .annotate(search_rank=SearchRank(F('search_vector'), query))
+        .order_by('-search_rank', '-created_at', '-id')
+    )
+
+
+class Casefold(Func):
+    """
+    Приведение к нижнему регистру. LOWER в SQLite понимает только
+    ASCII, поэтому там вызывается CASEFOLD, которую регистрирует
+    register_sqlite_functions.
+    """
+    function = 'LOWER'
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return self.as_sql(compiler, connection, function='CASEFOLD',
+                           **extra_context)
+
+
+def fallback_search(queryset, value):
+    """
+    Поиск для СУБД без полнотекстового поиска (SQLite в тестах):
+    каждое слово должно встретиться в названии, описании или
+    ингредиентах без учёта регистра, в том числе кириллицы;
+    совпадения в названии выше в выдаче.
+    """
+    words = value.casefold().split()
+    if not words:
+        return queryset
+    queryset = queryset.alias(folded_name=Casefold('name'),
+                              folded_text=Casefold('text'))
+    ingredients = RecipeIngredient.objects.alias(
+        folded_name=Casefold('ingredient__name')
+    )
+    rank = 0
+    for word in words:
+        in_ingredients = Exists(ingredients.filter(
+            recipe=OuterRef('pk'), folded_name__contains=word
+        ))
+        queryset = queryset.filter(
+            Q(folded_name__contains=word) | Q(folded_text__contains=word)
+            | in_ingredients
+        )
+        rank += Case(
+            When(folded_name__contains=word, then=3),
+            When(in_ingredients, then=2),
+            default=1,
+            output_field=IntegerField(),
+        )
+    return queryset.annotate(search_rank=rank).order_by(
+        '-search_rank', '-created_at', '-id'
+    )
+
+
+def search_recipes(queryset, value):
+    if connection.vendor == 'postgresql':
+        return postgres_search(queryset, value)
+    return fallback_search(queryset, value)
@@ -1,9 +1,11 @@
 from django.contrib.auth import get_user_model
 from django.db import transaction
-from django.shortcuts import get_object_or_404
-from djoser.serializers import UserSerializer
-from drf_extra_fields.fields import Base64ImageField
+from django.db.models import Prefetch, prefetch_related_objects
+from recipes.cache import RECIPES_VERSION, bump_version
+from recipes.fields import HashedBase64ImageField, ImageUrlField, SrcsetField
+from recipes.images import schedule_thumbnails
 from recipes.models import Ingredient, Recipe, RecipeIngredient, Tag
+from recipes.search import schedule_search_update
 from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
 from users.serializers import CustomUserSerializer
@@ -57,8 +59,9 @@ class ReadRecipeSerializer(serializers.ModelSerializer):
         many=True,
         read_only=True
     )
-    author = UserSerializer(read_only=True)
-    image = Base64ImageField(max_length=None)
+    author = CustomUserSerializer(read_only=True)
+    image = ImageUrlField()
+    srcset = SrcsetField()
     is_favorited = serializers.SerializerMethodField(read_only=True)
     is_in_shopping_cart = serializers.SerializerMethodField(read_only=True)
 
@@ -67,14 +70,14 @@ class ReadRecipeSerializer(serializers.ModelSerializer):
         fields = (
             'id', 'tags', 'author', 'ingredients',
             'is_favorited', 'is_in_shopping_cart',
-            'name', 'image', 'text', 'cooking_time'
+            'name', 'image', 'srcset', 'text', 'cooking_time'
         )
 
     def get_is_favorited(self, obj):
-        return obj.id in self.context.get('subscriptions', [])
+        return getattr(obj, 'is_favorited', False)
 
     def get_is_in_shopping_cart(self, obj):
-        return obj.id in self.context.get('is_in_shopping_cart', [])
+        return getattr(obj, 'is_in_shopping_cart', False)
 
 
 class RecipeCreateSerializer(serializers.ModelSerializer):
@@ -82,7 +85,7 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
                                               many=True)
     author = CustomUserSerializer(read_only=True)
     ingredients = IngredientInRecipeWriteSerializer(many=True)
-    image = Base64ImageField()
+    image = HashedBase64ImageField()
 
     class Meta:
         model = Recipe
@@ -95,16 +98,23 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
             raise ValidationError(
                 detail={'ingredients': 'Требуется хотя бы один ингредиент'}
             )
-        ingredient_list = []
-        for item in ingredients:
-            item_object = get_object_or_404(Ingredient, id=item['id'])
-            if item_object in ingredient_list:
-                raise ValidationError(
-                    detail={
-                        'ingredients': 'Ингредиенты не должны повторяться'
-                    }
-                )
-            ingredient_list.append(item_object)
+        ids = [item['id'] for item in ingredients]
+        if len(set(ids)) != len(ids):
+            raise ValidationError(
+                detail={
+                    'ingredients': 'Ингредиенты не должны повторяться'
+                }
+            )
+        missing = set(ids) - set(
+            Ingredient.objects.filter(id__in=ids).values_list('id', flat=True)
+        )
+        if missing:
+            raise ValidationError(
+                detail={
+                    'ingredients': ('Ингредиенты не существуют: '
+                                    f'{sorted(missing)}')
+                }
+            )
         return value
 
     @transaction.atomic
@@ -113,7 +123,7 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
         RecipeIngredient.objects.bulk_create(
             [RecipeIngredient(
                 recipe=recipe,
-                ingredient=Ingredient.objects.get(pk=ingredient['id']),
+                ingredient_id=ingredient['id'],
                 amount=ingredient['amount']
             ) for ingredient in ingredients]
         )
@@ -125,30 +135,114 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
         recipe = Recipe.objects.create(**validated_data)
         self.create_ingredients(tags=tags, recipe=recipe,
                                 ingredients=ingredients)
+        schedule_thumbnails(recipe.image.name)
         return recipe
 
+    @staticmethod
+    def update_ingredients(recipe, ingredients):
+        amounts = {item['id']: item['amount'] for item in ingredients}
+        current = {
+            row.ingredient_id: row
+            for row in RecipeIngredient.objects.filter(recipe=recipe)
+        }
+        removed = current.keys() - amounts.keys()
+        if removed:
+            RecipeIngredient.objects.filter(
+                recipe=recipe, ingredient_id__in=removed
+            ).delete()
+        changed = []
+        for ingredient_id, row in current.items():
+            amount = amounts.get(ingredient_id)
+            if amount is not None and row.amount != amount:
+                row.amount = amount
+                changed.append(row)
+        if changed:
+            RecipeIngredient.objects.bulk_update(changed, ['amount'])
+        added = [
+            RecipeIngredient(recipe=recipe, ingredient_id=ingredient_id,
+                             amount=amount)
+            for ingredient_id, amount in amounts.items()
+            if ingredient_id not in current
+        ]
+        if added:
+            RecipeIngredient.objects.bulk_create(added)
+            # bulk_create не отправляет post_save, удаление же вектор
+            # пересчитает через сигнал post_delete.
+            schedule_search_update([recipe.pk])
+        if removed or changed or added:
+            bump_version(RECIPES_VERSION)
+
     @transaction.atomic
     def update(self, instance: Recipe, validated_data):
-        instance.image = validated_data.get('image', instance.image)
-        instance.name = validated_data.get('name', instance.name)
-        instance.text = validated_data.get('text', instance.text)
-        instance.cooking_time = validated_data.get(
-            'cooking_time', instance.cooking_time)
-        tags = validated_data.pop('tags', instance.tags)
-        ingredients = validated_data.pop('ingredients', instance.ingredients)
-        RecipeIngredient.objects.filter(recipe=instance).delete()
-        self.create_ingredients(tags=tags, recipe=instance,
-                                ingredients=ingredients)
-        instance.save()
+        tags = validated_data.pop('tags', None)
+        ingredients = validated_data.pop('ingredients', None)
+        if 'image' in validated_data:
+            validated_data['thumbnails_ready'] = False
+        if validated_data:
+            for field, value in validated_data.items():
+                setattr(instance, field, value)
+            instance.save(update_fields=list(validated_data))
+            if 'image' in validated_data:
+                schedule_thumbnails(instance.image.name)
+        if tags is not None:
+            instance.tags.set(tags)
+        if ingredients is not None:
+            self.update_ingredients(instance, ingredients)
         return instance
 
     def to_representation(self, instance):
+        prefetch_related_objects(
+            [instance],
+            Prefetch(
+                'recipesingredients',
+                queryset=RecipeIngredient.objects.select_related('ingredient')
+            ),
+            'tags',
+        )
         return ReadRecipeSerializer(instance, context=self.context).data
 
 
 class RecipeShortInfoSerializer(serializers.ModelSerializer):
-    image = Base64ImageField()
+    image = ImageUrlField()
+    srcset = SrcsetField()
 
     class Meta:
         model = Recipe
-        fields = ('id', 'image', 'name', 'cooking_time')
+        fields = ('id', 'image', 'srcset', 'name', 'cooking_time')
+
+
+class IngredientMatchSerializer(serializers.Serializer):
+    ingredients = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        min_length=1, max_length=200
+    )
+    max_missing = serializers.IntegerField(min_value=0, required=False)
+
+
+class MatchedRecipeSerializer(ReadRecipeSerializer):
+    matched_count = serializers.IntegerField(read_only=True)
+    missing_count = serializers.IntegerField(read_only=True)
+    coverage = serializers.FloatField(read_only=True)
+
+    class Meta(ReadRecipeSerializer.Meta):
+        fields = ReadRecipeSerializer.Meta.fields + (
+            'matched_count', 'missing_count', 'coverage'
+        )
+
+
+class BatchRelationSerializer(serializers.Serializer):
+    add = serializers.ListField(child=serializers.IntegerField(min_value=1),
+                                max_length=100, required=False, default=list)
+    remove = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        max_length=100, required=False, default=list
+    )
+
+    def validate(self, data):
+        if not data['add'] and not data['remove']:
+            raise ValidationError('Передайте id в add или remove.')
+        if set(data['add']) & set(data['remove']):
+            raise ValidationError(
+                'Один и тот же id нельзя добавить и удалить одновременно.'
+            )
+        return data
@@ -0,0 +1,88 @@
+import csv
+import io
+import json
+
+from django.conf import settings
+from PIL import Image, ImageDraw, ImageFont
+
+PDF_PAGE_SIZE = (595, 842)
+PDF_MARGIN = 40
+PDF_LINE_HEIGHT = 20
+
+
+class Echo:
+    """
+    Псевдобуфер для csv.writer: возвращает строку вместо записи,
+    чтобы строки CSV можно было отдавать потоком.
+    """
+
+    def write(self, value):
+        return value
+
+
+def format_line(name, unit, amount):
+    return f'- {name} ({unit}) - {amount}'
+
+
+def write_txt(title, rows):
+    yield f'{title}\n\n'
+    for name, unit, amount in rows:
+        yield format_line(name, unit, amount) + '\n'
+
+
+def write_csv(title, rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(('Ингредиент', 'Единица измерения', 'Количество'))
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def write_json(title, rows):
+    yield '{"title": %s, "ingredients": [' % json.dumps(title)
+    separator = ''
+    for name, unit, amount in rows:
+        yield separator + json.dumps(
+            {'name': name, 'measurement_unit': unit, 'amount': amount},
+            ensure_ascii=False
+        )
+        separator = ', '
+    yield ']}'
+
+
+def load_pdf_font():
+    try:
+        return ImageFont.truetype(settings.SHOPPING_LIST_FONT, 14)
+    except OSError:
+        return ImageFont.load_default()
+
+
+def write_pdf(title, rows):
+    """
+    PDF собирается целиком: формат требует таблицу ссылок в конце
+    файла, поэтому страницы рендерятся Pillow и отдаются одним куском.
+    """
+    font = load_pdf_font()
+    lines_per_page = (PDF_PAGE_SIZE[1] - 2 * PDF_MARGIN) // PDF_LINE_HEIGHT
+    lines = [title, ''] + [format_line(*row) for row in rows]
+    pages = []
+    for start in range(0, len(lines), lines_per_page):
+        page = Image.new('RGB', PDF_PAGE_SIZE, 'white')
+        draw = ImageDraw.Draw(page)
+        for number, line in enumerate(lines[start:start + lines_per_page]):
+            draw.text(
+                (PDF_MARGIN, PDF_MARGIN + number * PDF_LINE_HEIGHT),
+                line, fill='black', font=font
+            )
+        pages.append(page)
+    buffer = io.BytesIO()
+    pages[0].save(buffer, format='PDF', save_all=True,
+                  append_images=pages[1:])
+    yield buffer.getvalue()
+
+
+FORMATS = {
+    'txt': ('text/plain; charset=utf-8', write_txt),
+    'csv': ('text/csv; charset=utf-8', write_csv),
+    'json': ('application/json', write_json),
+    'pdf': ('application/pdf', write_pdf),
+}
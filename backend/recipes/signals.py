@@ -0,0 +1,100 @@
+from django.contrib.auth import get_user_model
+from django.db.backends.signals import connection_created
+from django.db.models.signals import (m2m_changed, post_delete, post_init,
+                                      post_save)
+from django.dispatch import receiver
+from recipes.cache import (INGREDIENTS_VERSION, RECIPES_VERSION, TAGS_VERSION,
+                           bump_version)
+from recipes.models import Ingredient, Recipe, RecipeIngredient, Tag
+from recipes.search import schedule_search_update
+
+User = get_user_model()
+
+AUTHOR_FIELDS = ('username', 'first_name', 'last_name', 'email')
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_save, sender=RecipeIngredient)
+@receiver(post_delete, sender=RecipeIngredient)
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def bump_recipes_version(**kwargs):
+    if kwargs.get('action', 'post_').startswith('pre_'):
+        return
+    bump_version(RECIPES_VERSION)
+
+
+@receiver(post_save, sender=Recipe)
+def update_recipe_search_vector(instance, update_fields=None, **kwargs):
+    if update_fields and not set(update_fields) & {'name', 'text'}:
+        return
+    schedule_search_update([instance.pk])
+
+
+@receiver(post_save, sender=RecipeIngredient)
+@receiver(post_delete, sender=RecipeIngredient)
+def update_recipe_search_vector_for_item(instance, **kwargs):
+    schedule_search_update([instance.recipe_id])
+
+
+@receiver(post_save, sender=Ingredient)
+def update_search_vectors_for_ingredient(instance, created, **kwargs):
+    if created:
+        return
+    schedule_search_update(
+        RecipeIngredient.objects
+        .filter(ingredient=instance)
+        .values_list('recipe_id', flat=True)
+    )
+
+
+def author_fields(user):
+    # Берём значения из __dict__, чтобы не подгружать отложенные поля.
+    return {name: user.__dict__.get(name) for name in AUTHOR_FIELDS}
+
+
+@receiver(post_init, sender=User)
+def remember_author_fields(instance, **kwargs):
+    instance._author_fields = author_fields(instance)
+
+
+@receiver(post_save, sender=User)
+def bump_recipes_version_for_author(instance, created, update_fields=None,
+                                    **kwargs):
+    # В ответ рецепта входят только поля AUTHOR_FIELDS: регистрация,
+    # вход и смена пароля закэшированные рецепты не меняют.
+    if created or (update_fields
+                   and not set(update_fields) & set(AUTHOR_FIELDS)):
+        return
+    current = author_fields(instance)
+    if current == instance._author_fields:
+        return
+    instance._author_fields = current
+    bump_version(RECIPES_VERSION)
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def bump_ingredients_version(**kwargs):
+    bump_version(INGREDIENTS_VERSION)
+    bump_version(RECIPES_VERSION)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def bump_tags_version(**kwargs):
+    bump_version(TAGS_VERSION)
+    bump_version(RECIPES_VERSION)
+
+
+def casefold(value):
+    return value.casefold() if isinstance(value, str) else value
+
+
+@receiver(connection_created)
+def register_sqlite_functions(connection, **kwargs):
+    # CASEFOLD для Casefold в запасном поиске: LOWER в SQLite
+    # не меняет регистр кириллицы.
+    if connection.vendor == 'sqlite':
+        connection.connection.create_function('CASEFOLD', 1, casefold,
+                                              deterministic=True)
@@ -0,0 +1,65 @@
+import shutil
+import tempfile
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from recipes.models import Recipe
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from users.models import User
+
+GIF = (b'GIF89a\x01\x00\x01\x00\x00\x00\x00!\xf9\x04\x01\x00\x00\x00\x00,'
+       b'\x00\x00\x00\x00\x01\x00\x01\x00\x00\x02\x01\x00\x00')
+
+
+def create_user(username, **fields):
+    fields.setdefault('email', f'{username}@example.com')
+    fields.setdefault('first_name', 'Имя')
+    fields.setdefault('last_name', 'Фамилия')
+    return User.objects.create_user(username=username, password='password',
+                                    **fields)
+
+
+def create_recipe(author, name='Рецепт', **fields):
+    fields.setdefault('text', 'Описание')
+    fields.setdefault('cooking_time', 10)
+    return Recipe.objects.create(
+        author=author, name=name,
+        image=SimpleUploadedFile('recipe.gif', GIF, 'image/gif'), **fields
+    )
+
+
+def token_client(user):
+    client = APIClient()
+    token, _ = Token.objects.get_or_create(user=user)
+    client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+    return client
+
+
+class MediaTestCase(TestCase):
+    """
+    TestCase с собственным временным MEDIA_ROOT на класс, который
+    удаляется в tearDownClass. Миниатюры создаются синхронно.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.media_root = tempfile.mkdtemp()
+        cls.media_settings = override_settings(MEDIA_ROOT=cls.media_root,
+                                               IMAGE_WORKERS=0)
+        cls.media_settings.enable()
+        try:
+            super().setUpClass()
+        except Exception:
+            cls.cleanup_media()
+            raise
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls.cleanup_media()
+
+    @classmethod
+    def cleanup_media(cls):
+        cls.media_settings.disable()
+        shutil.rmtree(cls.media_root, ignore_errors=True)
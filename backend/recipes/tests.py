@@ -0,0 +1,429 @@
+from base64 import b64encode
+from io import BytesIO, StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from PIL import Image
+from recipes.autocomplete import ingredient_index
+from recipes.cache import RECIPES_VERSION, get_version
+from recipes.images import generate_thumbnails, thumbnail_name
+from recipes.models import (FavoriteRecipe, Ingredient, Recipe,
+                            RecipeIngredient, ShoppingCart, Tag)
+from recipes.relations import add_relation, batch_relations, remove_relation
+from recipes.search import flush_search_updates, schedule_search_update
+from recipes.serializers import ReadRecipeSerializer
+from recipes.testing import (MediaTestCase, create_recipe, create_user,
+                             token_client)
+from rest_framework.serializers import BaseSerializer
+from rest_framework.test import APIClient
+from users.models import Subscribe, User
+
+
+class RecipesTestCase(MediaTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [create_user(f'user{index}') for index in range(3)]
+        cls.tags = [
+            Tag.objects.create(name=f'Тег {index}', color=f'#00000{index}',
+                               slug=f'tag{index}')
+            for index in range(3)
+        ]
+        cls.ingredients = [
+            Ingredient.objects.create(name=f'ингредиент {index}',
+                                      measurement_unit='г')
+            for index in range(10)
+        ]
+        cls.recipes = []
+        for index in range(12):
+            recipe = create_recipe(cls.users[index % 3], f'Рецепт {index}',
+                                   cooking_time=10 + index)
+            recipe.tags.set(cls.tags[:1 + index % 3])
+            RecipeIngredient.objects.bulk_create(
+                RecipeIngredient(recipe=recipe, ingredient=ingredient,
+                                 amount=position + 1)
+                for position, ingredient in enumerate(
+                    cls.ingredients[:1 + index % 5]
+                )
+            )
+            cls.recipes.append(recipe)
+        cls.user = cls.users[0]
+        for recipe in cls.recipes[:6]:
+            FavoriteRecipe.objects.create(user=cls.user, recipe=recipe)
+            ShoppingCart.objects.create(user=cls.user, recipe=recipe)
+        Subscribe.objects.create(user=cls.user, author=cls.users[1])
+
+    def setUp(self):
+        cache.clear()
+        self.guest = APIClient()
+        self.client = token_client(self.user)
+
+    def count_queries(self, client, url):
+        # Первый запрос создаёт строки версий и кэширует токен.
+        client.get('/api/recipes/?limit=1')
+        cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            response = client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries)
+
+
+class RecipeListQueryCountTests(RecipesTestCase):
+    def test_guest_query_count_does_not_grow_with_limit(self):
+        self.assertEqual(
+            self.count_queries(self.guest, '/api/recipes/?limit=2'),
+            self.count_queries(self.guest, '/api/recipes/?limit=10'),
+        )
+
+    def test_user_query_count_does_not_grow_with_limit(self):
+        self.assertEqual(
+            self.count_queries(self.client, '/api/recipes/?limit=2'),
+            self.count_queries(self.client, '/api/recipes/?limit=10'),
+        )
+
+    def test_user_flags(self):
+        response = self.client.get('/api/recipes/?is_favorited=1&limit=20')
+        self.assertEqual(response.data['count'], 6)
+        for recipe in response.data['results']:
+            self.assertTrue(recipe['is_favorited'])
+            self.assertTrue(recipe['is_in_shopping_cart'])
+
+
+class RelationTests(RecipesTestCase):
+    def test_add_and_remove_relation_update_counter(self):
+        recipe = self.recipes[10]
+        self.assertIsNotNone(add_relation(
+            FavoriteRecipe, 'recipe', 'favorites_count', self.user, recipe.id
+        ))
+        self.assertIsNone(add_relation(
+            FavoriteRecipe, 'recipe', 'favorites_count', self.user, recipe.id
+        ))
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.favorites_count, 1)
+        self.assertTrue(remove_relation(
+            FavoriteRecipe, 'recipe', 'favorites_count', self.user, recipe.id
+        ))
+        self.assertFalse(remove_relation(
+            FavoriteRecipe, 'recipe', 'favorites_count', self.user, recipe.id
+        ))
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.favorites_count, 0)
+
+    def test_add_relation_to_missing_object(self):
+        self.assertIsNone(add_relation(
+            FavoriteRecipe, 'recipe', 'favorites_count', self.user, 10 ** 6
+        ))
+
+    def test_self_subscription_is_rejected(self):
+        self.assertIsNone(add_relation(
+            Subscribe, 'author', 'subscribers_count', self.user,
+            self.user.id, allow_self=False
+        ))
+
+    def test_batch_relations(self):
+        user = self.users[2]
+        first, second = self.recipes[0], self.recipes[1]
+        FavoriteRecipe.objects.create(user=user, recipe=second)
+        second_count = Recipe.objects.get(id=second.id).favorites_count
+        statuses, linked = batch_relations(
+            FavoriteRecipe, 'recipe', 'favorites_count', user,
+            add=[first.id, second.id, 10 ** 6]
+        )
+        self.assertEqual(
+            {item['id']: item['status'] for item in statuses},
+            {first.id: 'added', second.id: 'exists', 10 ** 6: 'not_found'}
+        )
+        self.assertEqual(linked, {first.id, second.id})
+        first.refresh_from_db()
+        self.assertEqual(first.favorites_count, 1)
+        second.refresh_from_db()
+        self.assertEqual(second.favorites_count, second_count)
+
+        statuses, _ = batch_relations(
+            FavoriteRecipe, 'recipe', 'favorites_count', user,
+            remove=[first.id, self.recipes[5].id]
+        )
+        self.assertEqual(
+            {item['id']: item['status'] for item in statuses},
+            {first.id: 'removed', self.recipes[5].id: 'absent'}
+        )
+        first.refresh_from_db()
+        self.assertEqual(first.favorites_count, 0)
+
+
+class FavoriteApiTests(RecipesTestCase):
+    def test_favorite_toggle(self):
+        url = f'/api/recipes/{self.recipes[11].id}/favorite/'
+        self.assertEqual(self.client.post(url).status_code, 201)
+        self.assertEqual(self.client.post(url).status_code, 400)
+        self.assertEqual(self.client.delete(url).status_code, 204)
+        self.assertEqual(self.client.delete(url).status_code, 400)
+
+    def test_favorite_missing_recipe(self):
+        response = self.client.post(f'/api/recipes/{10 ** 6}/favorite/')
+        self.assertEqual(response.status_code, 404)
+
+    def test_favorite_returns_absolute_image_url(self):
+        response = self.client.post(
+            f'/api/recipes/{self.recipes[11].id}/favorite/'
+        )
+        self.assertTrue(
+            response.data['image'].startswith('http://testserver/')
+        )
+
+    def test_batch_returns_absolute_image_urls(self):
+        response = self.client.post(
+            '/api/recipes/favorite/batch/',
+            {'add': [self.recipes[10].id, self.recipes[11].id]},
+            format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 2)
+        for recipe in response.data['results']:
+            self.assertTrue(recipe['image'].startswith('http://testserver/'))
+
+
+class TrendingOrderingTests(RecipesTestCase):
+    def test_trending_orders_by_stored_score(self):
+        call_command('update_trending', rebuild=True, stdout=StringIO())
+        favorited = {recipe.id for recipe in self.recipes[:6]}
+        self.assertTrue(all(
+            score > 0 for score in Recipe.objects.filter(
+                id__in=favorited
+            ).values_list('trending_score', flat=True)
+        ))
+        with CaptureQueriesContext(connection) as context:
+            response = self.guest.get('/api/recipes/?ordering=trending')
+        self.assertEqual(
+            {recipe['id'] for recipe in response.data['results']}, favorited
+        )
+        self.assertFalse(any(
+            'recipes_recipetrend' in query['sql']
+            for query in context.captured_queries
+        ))
+
+
+class CursorPaginationTests(RecipesTestCase):
+    def walk(self, url):
+        ids, sql = [], []
+        while url:
+            with CaptureQueriesContext(connection) as context:
+                response = self.guest.get(url)
+            self.assertEqual(response.status_code, 200)
+            sql += [query['sql'] for query in context.captured_queries]
+            ids += [recipe['id'] for recipe in response.data['results']]
+            url = response.data['next']
+        return ids, response, sql
+
+    def test_cursor_walks_tied_ordering_without_offset(self):
+        Recipe.objects.update(favorites_count=0)
+        Recipe.objects.filter(id=self.recipes[3].id).update(
+            favorites_count=5
+        )
+        expected = [
+            recipe['id'] for recipe in self.guest.get(
+                '/api/recipes/?ordering=popular&limit=100'
+            ).data['results']
+        ]
+        ids, last, sql = self.walk(
+            '/api/recipes/?pagination=cursor&ordering=popular&limit=2'
+        )
+        self.assertEqual(ids, expected)
+        self.assertEqual(ids[0], self.recipes[3].id)
+        self.assertFalse(any('OFFSET' in query for query in sql))
+
+        backwards = []
+        url = last.data['previous']
+        while url:
+            response = self.guest.get(url)
+            backwards = [
+                recipe['id'] for recipe in response.data['results']
+            ] + backwards
+            url = response.data['previous']
+        self.assertEqual(backwards, expected[:-2])
+
+    def test_invalid_cursor(self):
+        for position in ('p=nope', 'p=%5B%221%22%5D',
+                         'p=%5B%22x%22%2C+%22y%22%5D'):
+            cursor = b64encode(position.encode()).decode()
+            response = self.guest.get(f'/api/recipes/?cursor={cursor}')
+            self.assertEqual(response.status_code, 404)
+
+    def test_match_cursor_walks_tied_missing_count(self):
+        ingredients = '&'.join(
+            f'ingredients={ingredient.id}'
+            for ingredient in self.ingredients[:3]
+        )
+        expected = [
+            recipe['id'] for recipe in self.guest.get(
+                f'/api/recipes/match/?{ingredients}&limit=100'
+            ).data['results']
+        ]
+        ids, _, sql = self.walk(
+            f'/api/recipes/match/?{ingredients}&pagination=cursor&limit=2'
+        )
+        self.assertEqual(len(expected), len(self.recipes))
+        self.assertEqual(ids, expected)
+        self.assertFalse(any('OFFSET' in query for query in sql))
+
+
+class IngredientAutocompleteTests(RecipesTestCase):
+    def setUp(self):
+        super().setUp()
+        # Индекс живёт в памяти процесса, а версии откатываются вместе
+        # с транзакцией теста: сбрасываем его, чтобы не взять чужой.
+        ingredient_index.__init__()
+        self.addCleanup(ingredient_index.__init__)
+
+    def test_warm_autocomplete_runs_one_query(self):
+        url = '/api/ingredients/?name=ингр'
+        response = self.guest.get(url)
+        self.assertEqual(len(response.data), 10)
+        with self.assertNumQueries(1):
+            response = self.guest.get(url)
+        self.assertEqual(response.status_code, 200)
+        with self.assertNumQueries(1):
+            self.guest.get('/api/ingredients/')
+
+    def test_autocomplete_sees_new_ingredient(self):
+        self.guest.get('/api/ingredients/?name=ингр')
+        with self.captureOnCommitCallbacks(execute=True):
+            Ingredient.objects.create(name='ингредиент новый',
+                                      measurement_unit='г')
+        names = [
+            item['name'] for item in
+            self.guest.get('/api/ingredients/?name=ингредиент н').data
+        ]
+        self.assertEqual(names, ['ингредиент новый'])
+
+
+class RecipesVersionTests(RecipesTestCase):
+    def assertBumps(self, expected, action):
+        before = get_version(RECIPES_VERSION)
+        with self.captureOnCommitCallbacks(execute=True):
+            action()
+        self.assertEqual(get_version(RECIPES_VERSION) - before, expected)
+
+    def test_signup_and_password_change_keep_version(self):
+        self.assertBumps(0, lambda: create_user('new'))
+        user = User.objects.get(id=self.users[1].id)
+        user.set_password('another-password')
+        self.assertBumps(0, user.save)
+
+    def test_author_name_change_bumps_version(self):
+        user = User.objects.get(id=self.users[1].id)
+        user.first_name = 'Другое'
+        self.assertBumps(1, user.save)
+        self.assertBumps(0, user.save)
+
+    def test_update_trending_bumps_version(self):
+        self.assertBumps(1, lambda: call_command(
+            'update_trending', stdout=StringIO()
+        ))
+
+    def test_popular_ordering_is_not_cached(self):
+        url = '/api/recipes/?ordering=popular'
+        self.guest.get(url)
+        self.assertNotIn('X-Cache', self.guest.get(url))
+        self.guest.get('/api/recipes/')
+        self.assertEqual(self.guest.get('/api/recipes/')['X-Cache'], 'HIT')
+
+
+class SearchTests(RecipesTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        beet = Ingredient.objects.create(name='Свёкла', measurement_unit='г')
+        cls.found = []
+        for name, text, ingredient in (
+            ('Салат', 'Как борщ, только холодный', None),
+            ('Суп', 'Описание', beet),
+            ('Борщ', 'Описание', None),
+        ):
+            recipe = create_recipe(cls.users[0], name, text=text,
+                                   cooking_time=5)
+            if ingredient:
+                RecipeIngredient.objects.create(recipe=recipe,
+                                                ingredient=ingredient,
+                                                amount=1)
+            cls.found.append(recipe)
+
+    def search(self, value):
+        response = self.guest.get('/api/recipes/', {'search': value})
+        self.assertEqual(response.status_code, 200)
+        return [recipe['id'] for recipe in response.data['results']]
+
+    def test_search_is_case_insensitive_for_cyrillic(self):
+        salad, _, borscht = self.found
+        for value in ('борщ', 'БОРЩ', 'Борщ'):
+            self.assertEqual(self.search(value), [borscht.id, salad.id])
+
+    def test_search_ranks_name_then_ingredients_then_text(self):
+        salad, soup, borscht = self.found
+        Recipe.objects.filter(id=salad.id).update(text='Свёкла и борщ')
+        self.assertEqual(self.search('свёКЛА'), [soup.id, salad.id])
+
+    def test_search_requires_every_word(self):
+        salad, _, _ = self.found
+        self.assertEqual(self.search('холодный борщ'), [salad.id])
+        self.assertEqual(self.search('холодный суп'), [])
+
+    def test_search_updates_are_merged_per_transaction(self):
+        with mock.patch('recipes.search.update_search_vectors') as update:
+            # Фикстуры класса не фиксируются: сбрасываем накопленные id.
+            flush_search_updates()
+            update.reset_mock()
+            with self.captureOnCommitCallbacks(execute=True):
+                schedule_search_update([2, 1])
+                schedule_search_update([1])
+        update.assert_called_once_with([1, 2])
+
+
+class ThumbnailTests(RecipesTestCase):
+    def test_srcset_is_empty_until_thumbnails_exist(self):
+        recipe = self.recipes[0]
+        url = f'/api/recipes/{recipe.id}/'
+        self.assertEqual(self.guest.get(url).data['srcset'], '')
+        with self.captureOnCommitCallbacks(execute=True):
+            generate_thumbnails(recipe.image.name)
+        srcset = self.guest.get(url).data['srcset']
+        for candidate in srcset.split(', '):
+            path = candidate.split()[0]
+            self.assertTrue(path.startswith('http://testserver/'))
+            name = path.split(settings.MEDIA_URL, 1)[1]
+            self.assertTrue(default_storage.exists(name))
+
+    def test_transparent_image_keeps_alpha(self):
+        buffer = BytesIO()
+        Image.new('RGBA', (600, 300), (255, 0, 0, 0)).save(buffer, 'PNG')
+        name = default_storage.save('recipes/transparent.png',
+                                    ContentFile(buffer.getvalue()))
+        generate_thumbnails(name)
+        with default_storage.open(thumbnail_name(name, 240, 'webp')) as file:
+            thumbnail = Image.open(file)
+            thumbnail.load()
+        self.assertEqual(thumbnail.mode, 'RGBA')
+        self.assertEqual(thumbnail.getpixel((0, 0))[3], 0)
+
+
+class ProfilingTests(RecipesTestCase):
+    @override_settings(PROFILING_ENABLED=True)
+    def test_serializer_time_without_global_patch(self):
+        data_property = BaseSerializer.data
+        with self.assertLogs('foodgram.profiling'):
+            response = APIClient().get('/api/recipes/?limit=2')
+        timings = dict(
+            item.split(';', 1) for item in
+            response['Server-Timing'].split(', ')
+        )
+        self.assertGreater(float(timings['serializer'].split('=')[1]), 0)
+        self.assertIs(BaseSerializer.data, data_property)
+        serializer = ReadRecipeSerializer(self.recipes[0])
+        self.assertIs(type(serializer), ReadRecipeSerializer)
+
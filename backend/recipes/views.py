@@ -1,89 +1,145 @@
 import datetime as dt
 from http import HTTPStatus
 
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.db.models import Prefetch, Sum
-from django.http import HttpResponse
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import (Count, Exists, F, FloatField, Max, OuterRef,
+                              Prefetch, Q, Sum)
+from django.db.models.functions import Cast
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
-from recipes import filters, serializers
-from recipes.filters import RecipeFilter
+from recipes import serializers, shopping_list
+from recipes.autocomplete import ingredient_index
+from recipes.cache import (INGREDIENTS_VERSION, RECIPES_VERSION, TAGS_VERSION,
+                           get_version)
+from recipes.counters import RECIPE_COUNTERS, change_counter
+from recipes.filters import MATCH_ORDERING, RECIPE_ORDERINGS, RecipeFilter
+from recipes.mixins import (AnonymousCacheMixin, ConditionalGetMixin,
+                            SerializerTimingMixin)
 from recipes.models import (FavoriteRecipe, Ingredient, Recipe,
                             RecipeIngredient, ShoppingCart, Tag)
-from recipes.paginations import CustomPagination
+from recipes.paginations import CustomCursorPagination, FeedPagination
 from recipes.permissions import IsAdminOrReadOnly, IsAuthorOrReadOnlyPermission
-from recipes.serializers import (ReadRecipeSerializer, RecipeCreateSerializer,
+from recipes.relations import add_relation, batch_relations, remove_relation
+from recipes.serializers import (BatchRelationSerializer,
+                                 IngredientMatchSerializer,
+                                 MatchedRecipeSerializer, ReadRecipeSerializer,
+                                 RecipeCreateSerializer,
                                  RecipeShortInfoSerializer)
 from rest_framework import viewsets
 from rest_framework.decorators import action
 from rest_framework.permissions import (SAFE_METHODS, IsAuthenticated,
                                         IsAuthenticatedOrReadOnly)
 from rest_framework.response import Response
+from users.models import Subscribe
 
 User = get_user_model()
 
 
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+class TagViewSet(ConditionalGetMixin, SerializerTimingMixin,
+                 viewsets.ReadOnlyModelViewSet):
+    version_key = TAGS_VERSION
     queryset = Tag.objects.all()
     serializer_class = serializers.TagSerializer
     permission_classes = (IsAdminOrReadOnly,)
 
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+class IngredientViewSet(ConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
+    version_key = INGREDIENTS_VERSION
     queryset = Ingredient.objects.all()
     permission_classes = (IsAdminOrReadOnly,)
     serializer_class = serializers.IngredientsSerializer
-    filter_backends = [DjangoFilterBackend]
-    filterset_class = filters.IngredientFilter
 
+    def list(self, request, *args, **kwargs):
+        name = request.query_params.get('name')
+        if not name:
+            return Response(ingredient_index.all(self.data_version))
+        return Response(ingredient_index.search(
+            name, settings.INGREDIENT_AUTOCOMPLETE_LIMIT, self.data_version
+        ))
 
-class RecipeViewSet(viewsets.ModelViewSet):
+
+class RecipeViewSet(AnonymousCacheMixin, SerializerTimingMixin,
+                    viewsets.ModelViewSet):
+    version_key = RECIPES_VERSION
     queryset = (
         Recipe.objects
         .select_related('author')
-        .prefetch_related(Prefetch('ingredients'))
+        .defer('search_vector')
+        .prefetch_related(
+            Prefetch(
+                'recipesingredients',
+                queryset=RecipeIngredient.objects.select_related('ingredient')
+            ),
+            'tags',
+        )
         .all()
     )
     permission_classes = (IsAuthorOrReadOnlyPermission,
                           IsAuthenticatedOrReadOnly)
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
-    pagination_class = CustomPagination
-
-    def get_serializer_context(self):
-        context = super().get_serializer_context()
-        if self.request.user.is_authenticated:
-            context['subscriptions'] = set(
-                FavoriteRecipe.objects
-                .filter(user=self.request.user)
-                .values_list('recipe__author_id', flat=True)
-            )
-            context['is_in_shopping_cart'] = set(
-                ShoppingCart.objects
-                .filter(user=self.request.user)
-                .values_list('recipe_id', flat=True)
-            )
-        return context
-
-    def get_queryset(self):
-        request = self.request
-        user = request.user
-        queryset = self.queryset
-        is_favorite = request.query_params.get('is_favorited')
-        is_in_shopping_cart = request.query_params.get('is_in_shopping_cart')
+    pagination_class = FeedPagination
 
-        if is_favorite:
-            queryset = queryset.filter(favorite_recipes__user=user)
+    @property
+    def cursor_ordering(self):
+        if self.action == 'match':
+            return MATCH_ORDERING
+        return RECIPE_ORDERINGS.get(
+            self.request.query_params.get('ordering'),
+            CustomCursorPagination.ordering
+        )
 
-        if is_in_shopping_cart:
-            queryset = queryset.filter(shopping_carts__user=user)
+    def is_cacheable(self, request):
+        # favorites_count меняется при каждом добавлении в избранное без
+        # смены версии рецептов, поэтому ordering=popular не кэшируется.
+        return (super().is_cacheable(request)
+                and request.query_params.get('ordering') != 'popular')
 
-        return queryset
+    def get_queryset(self):
+        user = self.request.user
+        queryset = self.queryset.all()
+        if not user.is_authenticated:
+            return queryset
+        authors = User.objects.annotate(
+            is_subscribed=Exists(
+                Subscribe.objects.filter(user=user, author=OuterRef('pk'))
+            )
+        )
+        return (
+            queryset
+            .select_related(None)
+            .prefetch_related(Prefetch('author', queryset=authors))
+            .annotate(
+                is_favorited=Exists(
+                    FavoriteRecipe.objects.filter(user=user,
+                                                  recipe=OuterRef('pk'))
+                ),
+                is_in_shopping_cart=Exists(
+                    ShoppingCart.objects.filter(user=user,
+                                                recipe=OuterRef('pk'))
+                ),
+            )
+        )
 
+    @transaction.atomic
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
+        change_counter(User.objects.filter(pk=self.request.user.pk),
+                       'recipes_count', 1)
+
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        instance.delete()
+        change_counter(User.objects.filter(pk=instance.author_id),
+                       'recipes_count', -1)
 
     def get_serializer_class(self):
+        if self.action == 'match':
+            return MatchedRecipeSerializer
         if self.request.method in SAFE_METHODS:
             return ReadRecipeSerializer
         return RecipeCreateSerializer
@@ -96,7 +152,8 @@ class RecipeViewSet(viewsets.ModelViewSet):
     def shopping_cart(self, *args, **kwargs):
         user = self.request.user
         if self.request.method == 'POST':
-            return self.add_to(ShoppingCart, user, self.kwargs['pk'])
+            return self.add_to(ShoppingCart, self.request,
+                               self.kwargs['pk'])
         return self.delete_from(ShoppingCart, user, self.kwargs['pk'])
 
     @action(
@@ -107,57 +164,173 @@ class RecipeViewSet(viewsets.ModelViewSet):
     def favorite(self, *args, **kwargs):
         user = self.request.user
         if self.request.method == 'POST':
-            return self.add_to(FavoriteRecipe, user, self.kwargs['pk'])
+            return self.add_to(FavoriteRecipe, self.request,
+                               self.kwargs['pk'])
         return self.delete_from(FavoriteRecipe, user, self.kwargs['pk'])
 
+    @action(
+        methods=['POST'],
+        detail=False,
+        url_path='shopping_cart/batch',
+        url_name='shopping-cart-batch',
+        permission_classes=(IsAuthenticated,)
+    )
+    def shopping_cart_batch(self, request, *args, **kwargs):
+        return self.batch(ShoppingCart, request)
+
+    @action(
+        methods=['POST'],
+        detail=False,
+        url_path='favorite/batch',
+        url_name='favorite-batch',
+        permission_classes=(IsAuthenticated,)
+    )
+    def favorite_batch(self, request, *args, **kwargs):
+        return self.batch(FavoriteRecipe, request)
+
+    @action(methods=['GET'], detail=False)
+    def match(self, request, *args, **kwargs):
+        params = IngredientMatchSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        queryset = self.match_ingredients(
+            self.filter_queryset(self.get_queryset()),
+            **params.validated_data
+        )
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    @staticmethod
+    def match_ingredients(queryset, ingredients, max_missing=None):
+        """
+        Ранжирует рецепты по доле имеющихся ингредиентов: сначала те,
+        где не хватает меньше всего. Кандидаты выбираются по индексу
+        ингредиента, совпадения считаются одним сгруппированным запросом.
+        """
+        candidates = RecipeIngredient.objects.filter(
+            ingredient_id__in=ingredients
+        ).values('recipe_id')
+        owned = Q(recipesingredients__ingredient_id__in=ingredients)
+        queryset = (
+            queryset
+            .filter(id__in=candidates)
+            .annotate(
+                total_count=Count('recipesingredients', distinct=True),
+                matched_count=Count(
+                    'recipesingredients',
+                    filter=owned,
+                    distinct=True
+                ),
+            )
+            .annotate(
+                missing_count=F('total_count') - F('matched_count'),
+                coverage=(Cast('matched_count', FloatField())
+                          / F('total_count')),
+            )
+        )
+        if max_missing is not None:
+            queryset = queryset.filter(missing_count__lte=max_missing)
+        return queryset.order_by(*MATCH_ORDERING)
+
     @action(
         methods=['GET'],
         detail=False,
         permission_classes=(IsAuthenticated,)
     )
     def download_shopping_cart(self, request, *args, **kwargs):
-        if not request.user.shopping_cart.exists():
+        file_format = request.query_params.get('format') or 'txt'
+        if file_format not in shopping_list.FORMATS:
+            return Response(
+                {'errors': 'Доступные форматы: '
+                           f'{", ".join(shopping_list.FORMATS)}'},
+                status=HTTPStatus.BAD_REQUEST
+            )
+        cart = request.user.shopping_cart.aggregate(total=Count('id'),
+                                                    last=Max('id'))
+        if not cart['total']:
             return Response(status=HTTPStatus.NOT_FOUND)
-        ingredients = RecipeIngredient.objects.filter(
-            recipe__shopping_carts__user=request.user
-        ).values(
-            'ingredient__name',
-            'ingredient__measurement_unit'
-        ).annotate(amount=Sum('amount'))
+        cache_key = (
+            f'shopping_cart:{request.user.id}:{cart["total"]}:'
+            f'{cart["last"]}:{get_version(RECIPES_VERSION)}'
+        )
+        ingredients = cache.get(cache_key)
+        if ingredients is None:
+            ingredients = self.aggregate_shopping_cart(request.user,
+                                                       cache_key)
 
         today = dt.date.today()
-        title = f'Foodgram: {today}\n\n'
-        shopping_list = title + '\n'.join(
-            [
-                f'- {ingredient["ingredient__name"]} '
-                f'({ingredient["ingredient__measurement_unit"]})'
-                f' - {ingredient["amount"]}'
-                for ingredient in ingredients
-            ]
+        content_type, writer = shopping_list.FORMATS[file_format]
+        response = StreamingHttpResponse(
+            writer(f'Foodgram: {today}', ingredients),
+            content_type=content_type
         )
-
-        filename = f'{today}-shopping-list.txt'
-        response = HttpResponse(shopping_list, content_type='text/plain')
+        filename = f'{today}-shopping-list.{file_format}'
         response['Content-Disposition'] = f'attachment; filename={filename}'
         return response
 
     @staticmethod
-    def add_to(model, user, pk: int):
-        if model.objects.filter(recipe_id=pk, user=user).exists():
+    def aggregate_shopping_cart(user, cache_key):
+        """
+        Отдаёт строки списка покупок по мере чтения серверного курсора
+        и после полного прохода сохраняет их в кэш.
+        """
+        rows = (
+            RecipeIngredient.objects
+            .filter(recipe__shopping_carts__user=user)
+            .values('ingredient__name', 'ingredient__measurement_unit')
+            .annotate(amount=Sum('amount'))
+            .values_list('ingredient__name', 'ingredient__measurement_unit',
+                         'amount')
+            .order_by('ingredient__name')
+        )
+        collected = []
+        for row in rows.iterator():
+            collected.append(row)
+            yield row
+        cache.set(cache_key, collected,
+                  settings.SHOPPING_LIST_CACHE_TIMEOUT)
+
+    def perform_content_negotiation(self, request, force=False):
+        # У выгрузки списка покупок ?format= выбирает формат файла,
+        # а не рендерер DRF.
+        return super().perform_content_negotiation(
+            request,
+            force=force or self.action == 'download_shopping_cart'
+        )
+
+    @staticmethod
+    def batch(model, request):
+        serializer = BatchRelationSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        statuses, linked = batch_relations(
+            model, 'recipe', RECIPE_COUNTERS[model], request.user,
+            **serializer.validated_data
+        )
+        recipes = RecipeShortInfoSerializer(
+            Recipe.objects.filter(id__in=linked), many=True,
+            context={'request': request}
+        )
+        return Response({'statuses': statuses, 'results': recipes.data})
+
+    @staticmethod
+    def add_to(model, request, pk: int):
+        recipe = add_relation(model, 'recipe', RECIPE_COUNTERS[model],
+                              request.user, pk)
+        if recipe is None:
+            get_object_or_404(Recipe.objects.only('id'), id=pk)
             return Response(
                 {'errors': 'Рецепт уже был добавлен'},
                 status=HTTPStatus.BAD_REQUEST
             )
-        recipe = get_object_or_404(Recipe, id=pk)
-        model.objects.create(recipe=recipe, user=user)
-        serializer = RecipeShortInfoSerializer(recipe)
+        serializer = RecipeShortInfoSerializer(
+            recipe, context={'request': request}
+        )
         return Response(serializer.data, status=HTTPStatus.CREATED)
 
     @staticmethod
     def delete_from(model, user: User, pk: int):
-        obj = model.objects.filter(recipe_id=pk, user=user)
-        if obj.exists():
-            obj.delete()
+        if remove_relation(model, 'recipe', RECIPE_COUNTERS[model],
+                           user, pk):
             return Response(status=HTTPStatus.NO_CONTENT)
         return Response(
             {'error': 'Рецепт не существует или был удален'},
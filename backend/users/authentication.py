@@ -0,0 +1,42 @@
+import hashlib
+
+from django.core.cache import caches
+from django.db import transaction
+from rest_framework.authentication import TokenAuthentication
+
+TOKEN_CACHE_ALIAS = 'tokens'
+
+
+def token_cache_key(key):
+    return 'auth_token:' + hashlib.sha256(key.encode()).hexdigest()
+
+
+def invalidate_token(key):
+    """
+    Удаляет токен из кэша сразу и ещё раз после фиксации транзакции:
+    иначе параллельный запрос успел бы закэшировать состояние,
+    прочитанное до фиксации (например, ещё активного пользователя).
+    """
+    cache_key = token_cache_key(key)
+    caches[TOKEN_CACHE_ALIAS].delete(cache_key)
+    transaction.on_commit(lambda: caches[TOKEN_CACHE_ALIAS].delete(cache_key))
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    TokenAuthentication, который хранит пару (пользователь, токен)
+    в кэше tokens, чтобы не делать запрос Token + User на каждый
+    запрос. Запись удаляется при удалении токена (выход через djoser)
+    и при изменении пользователя; размер и время жизни кэша задаются
+    TOKEN_CACHE_URL.
+    """
+
+    def authenticate_credentials(self, key):
+        cache = caches[TOKEN_CACHE_ALIAS]
+        cache_key = token_cache_key(key)
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return cached
+        user, token = super().authenticate_credentials(key)
+        cache.set(cache_key, (user, token))
+        return user, token
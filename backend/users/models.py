@@ -15,6 +15,12 @@ class User(AbstractUser):
         max_length=254,
         unique=True,
     )
+    recipes_count = models.PositiveIntegerField(
+        verbose_name='Количество рецептов', default=0, editable=False
+    )
+    subscribers_count = models.PositiveIntegerField(
+        verbose_name='Количество подписчиков', default=0, editable=False
+    )
 
     class Meta:
         ordering = ['id']
@@ -45,5 +51,9 @@ class Subscribe(models.Model):
             UniqueConstraint(fields=['user', 'author'],
                              name='unique_subscription')
         ]
+        indexes = [
+            models.Index(fields=['author', 'user'],
+                         name='subscribe_author_user_idx')
+        ]
         verbose_name = 'Подписка'
         verbose_name_plural = 'Подписки'
@@ -1,10 +1,8 @@
 from django.contrib.auth import get_user_model
 from djoser.serializers import UserCreateSerializer
-from drf_extra_fields.fields import Base64ImageField
+from recipes.fields import ImageUrlField, SrcsetField
 from recipes.models import Recipe
-from rest_framework import serializers, status
-from rest_framework.exceptions import ValidationError
-from users.models import Subscribe
+from rest_framework import serializers
 
 User = get_user_model()
 
@@ -18,7 +16,7 @@ class CustomUserSerializer(serializers.ModelSerializer):
                   'last_name', 'is_subscribed')
 
     def get_is_subscribed(self, obj):
-        return obj.id in self.context.get('is_subscribed', [])
+        return getattr(obj, 'is_subscribed', False)
 
 
 class CustomUserCreateSerializer(UserCreateSerializer):
@@ -31,11 +29,12 @@ class CustomUserCreateSerializer(UserCreateSerializer):
 
 
 class RecipeShortInfoSerializer(serializers.ModelSerializer):
-    image = Base64ImageField()
+    image = ImageUrlField()
+    srcset = SrcsetField()
 
     class Meta:
         model = Recipe
-        fields = ('id', 'image', 'name', 'cooking_time')
+        fields = ('id', 'image', 'srcset', 'name', 'cooking_time')
 
 
 class SubscribeSerializer(CustomUserSerializer):
@@ -48,28 +47,16 @@ class SubscribeSerializer(CustomUserSerializer):
         )
         read_only_fields = ('email', 'username')
 
-    def validate(self, data):
-        author = self.instance
-        user = self.context.get('request').user
-        if Subscribe.objects.filter(author=author, user=user).exists():
-            raise ValidationError(
-                detail='Вы уже подписаны на этого пользователя!',
-                code=status.HTTP_400_BAD_REQUEST
-            )
-        if user == author:
-            raise ValidationError(
-                detail='Вы не можете подписаться на самого себя!',
-                code=status.HTTP_400_BAD_REQUEST
-            )
-        return data
-
     def get_recipes(self, obj):
-        request = self.context.get('request')
-        limit = request.GET.get('recipes_limit')
-        recipes = obj.recipes.all()
-        if limit:
-            recipes = recipes[:int(limit)]
+        recipes = getattr(obj, 'recipes_preview', None)
+        if recipes is None:
+            request = self.context.get('request')
+            limit = request.GET.get('recipes_limit')
+            recipes = obj.recipes.all()
+            if limit:
+                recipes = recipes[:int(limit)]
         serializer = RecipeShortInfoSerializer(recipes,
                                                many=True,
-                                               read_only=True)
+                                               read_only=True,
+                                               context=self.context)
         return serializer.data
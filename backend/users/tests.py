@@ -0,0 +1,124 @@
+from django.core.cache import caches
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from recipes.counters import recount_all
+from recipes.testing import (MediaTestCase, create_recipe, create_user,
+                             token_client)
+from rest_framework.authtoken.models import Token
+from users.authentication import TOKEN_CACHE_ALIAS, token_cache_key
+from users.models import Subscribe
+
+
+class SubscriptionsTests(MediaTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user, *cls.authors = [
+            create_user(f'user{index}') for index in range(4)
+        ]
+        cls.recipe_counts = {}
+        for number, author in enumerate(cls.authors):
+            count = 5 + number
+            cls.recipe_counts[author.id] = count
+            for index in range(count):
+                create_recipe(author, f'Рецепт {index}')
+            Subscribe.objects.create(user=cls.user, author=author)
+        recount_all()
+
+    def setUp(self):
+        self.client = token_client(self.user)
+
+    def get_subscriptions(self, query=''):
+        response = self.client.get(f'/api/users/subscriptions/{query}')
+        self.assertEqual(response.status_code, 200)
+        return response.data['results']
+
+    def test_recipes_limit(self):
+        for limit in (0, 2, 100):
+            with self.subTest(limit=limit):
+                for author in self.get_subscriptions(
+                    f'?recipes_limit={limit}'
+                ):
+                    self.assertEqual(author['recipes_count'],
+                                     self.recipe_counts[author['id']])
+                    self.assertEqual(
+                        len(author['recipes']),
+                        min(limit, self.recipe_counts[author['id']])
+                    )
+
+    def test_query_count_does_not_grow_with_page_size(self):
+        self.get_subscriptions()
+        counts = []
+        for limit in (1, 3):
+            with CaptureQueriesContext(connection) as context:
+                self.get_subscriptions(f'?limit={limit}&recipes_limit=3')
+            counts.append(len(context.captured_queries))
+        self.assertEqual(counts[0], counts[1])
+
+    def test_subscribe_to_self_is_rejected(self):
+        response = self.client.post(
+            f'/api/users/{self.user.id}/subscribe/'
+        )
+        self.assertEqual(response.status_code, 400)
+
+
+class CachedTokenAuthenticationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('user')
+
+    def setUp(self):
+        caches[TOKEN_CACHE_ALIAS].clear()
+        self.client = token_client(self.user)
+        self.token = Token.objects.get(user=self.user)
+
+    def assertStatus(self, status):
+        self.assertEqual(self.client.get('/api/users/me/').status_code,
+                         status)
+
+    def assertCached(self, cached=True):
+        entry = caches[TOKEN_CACHE_ALIAS].get(token_cache_key(self.token.key))
+        self.assertEqual(entry is not None, cached)
+
+    def test_cached_token_is_reused(self):
+        self.assertStatus(200)
+        self.assertCached()
+        with CaptureQueriesContext(connection) as context:
+            self.assertStatus(200)
+        self.assertFalse(any(
+            Token._meta.db_table in query['sql']
+            for query in context.captured_queries
+        ))
+
+    def test_logout_revokes_cached_token(self):
+        self.assertStatus(200)
+        self.assertCached()
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/auth/token/logout/')
+        self.assertEqual(response.status_code, 204)
+        self.assertCached(False)
+        self.assertStatus(401)
+
+    def test_token_delete_revokes_cached_token(self):
+        self.assertStatus(200)
+        with self.captureOnCommitCallbacks(execute=True):
+            Token.objects.filter(user=self.user).delete()
+        self.assertStatus(401)
+
+    def test_deactivation_revokes_cached_token(self):
+        self.assertStatus(200)
+        self.assertCached()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_active = False
+            self.user.save()
+        self.assertCached(False)
+        self.assertStatus(401)
+
+    def test_user_change_is_visible_immediately(self):
+        self.assertStatus(200)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.first_name = 'Другое'
+            self.user.save()
+        response = self.client.get('/api/users/me/')
+        self.assertEqual(response.data['first_name'], 'Другое')
+
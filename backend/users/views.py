@@ -1,11 +1,16 @@
 from http import HTTPStatus
 
 from django.contrib.auth import get_user_model
-from django.db.models import Count
+from django.db.models import Exists, OuterRef, Value
 from django.shortcuts import get_object_or_404
 from djoser.views import UserViewSet
-from recipes.paginations import CustomPagination
+from recipes.mixins import SerializerTimingMixin
+from recipes.models import Recipe
+from recipes.paginations import FeedPagination
+from recipes.relations import add_relation, batch_relations, remove_relation
+from recipes.serializers import BatchRelationSerializer
 from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound, ValidationError
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from users.models import Subscribe
@@ -15,21 +20,23 @@ from users.serializers import CustomUserSerializer, SubscribeSerializer
 User = get_user_model()
 
 
-class CustomUserViewSet(UserViewSet):
+class CustomUserViewSet(SerializerTimingMixin, UserViewSet):
     queryset = User.objects.all()
     serializer_class = CustomUserSerializer
-    pagination_class = CustomPagination
+    pagination_class = FeedPagination
+    cursor_ordering = ('id',)
     permission_classes = (IsRetrieveAuthenticatedOrReadOnly,)
 
-    def get_serializer_context(self):
-        context = super().get_serializer_context()
-        if self.request.user.is_authenticated:
-            context['is_subscribed'] = set(
-                Subscribe.objects.filter(user=self.request.user)
-                .values_list('author_id')
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        user = self.request.user
+        if user.is_authenticated:
+            queryset = queryset.annotate(
+                is_subscribed=Exists(
+                    Subscribe.objects.filter(user=user, author=OuterRef('pk'))
+                )
             )
-            context['recipes_count'] = self.request.user.recipes.count()
-        return context
+        return queryset
 
     @action(
         detail=False,
@@ -50,23 +57,53 @@ class CustomUserViewSet(UserViewSet):
     def subscribe(self, request, **kwargs):
         user = request.user
         author_id = self.kwargs.get('id')
-        author = get_object_or_404(User, id=author_id)
 
         if request.method == 'POST':
-            serializer = SubscribeSerializer(
-                author, data=request.data, context={'request': request}
-            )
-            serializer.is_valid(raise_exception=True)
-            Subscribe.objects.create(user=user, author=author)
+            author = add_relation(Subscribe, 'author', 'subscribers_count',
+                                  user, author_id, allow_self=False)
+            if author is None:
+                author = get_object_or_404(User.objects.only('id'),
+                                           id=author_id)
+                if author == user:
+                    raise ValidationError(
+                        detail='Вы не можете подписаться на самого себя!'
+                    )
+                raise ValidationError(
+                    detail='Вы уже подписаны на этого пользователя!'
+                )
+            author.is_subscribed = True
+            self.attach_recipes([author], self.get_recipes_limit())
+            serializer = SubscribeSerializer(author,
+                                             context={'request': request})
             return Response(serializer.data, status=HTTPStatus.CREATED)
 
         if request.method == 'DELETE':
-            subscription = get_object_or_404(Subscribe,
-                                             user=user,
-                                             author=author)
-            subscription.delete()
+            if not remove_relation(Subscribe, 'author', 'subscribers_count',
+                                   user, author_id):
+                raise NotFound('Подписка не найдена')
             return Response(status=HTTPStatus.NO_CONTENT)
 
+    @action(
+        detail=False,
+        methods=['post'],
+        url_path='subscribe/batch',
+        url_name='subscribe-batch',
+        permission_classes=[IsAuthenticated]
+    )
+    def subscribe_batch(self, request, *args, **kwargs):
+        serializer = BatchRelationSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        statuses, linked = batch_relations(
+            Subscribe, 'author', 'subscribers_count', request.user,
+            allow_self=False, **serializer.validated_data
+        )
+        authors = CustomUserSerializer(
+            User.objects.filter(id__in=linked)
+            .annotate(is_subscribed=Value(True)),
+            many=True
+        )
+        return Response({'statuses': statuses, 'results': authors.data})
+
     @action(
         detail=False,
         permission_classes=[IsAuthenticated]
@@ -75,9 +112,47 @@ class CustomUserViewSet(UserViewSet):
         user = request.user
         queryset = (User.objects
                     .filter(subscribing__user=user)
-                    .annotate(recipes_count=Count('recipes')))
+                    .annotate(is_subscribed=Value(True)))
         pages = self.paginate_queryset(queryset)
-        serializer = SubscribeSerializer(pages,
-                                         many=True,
-                                         context={'request': request})
+        self.attach_recipes(pages, self.get_recipes_limit())
+        serializer = self.timed(SubscribeSerializer(
+            pages, many=True, context={'request': request}
+        ))
         return self.get_paginated_response(serializer.data)
+
+    def get_recipes_limit(self):
+        limit = self.request.query_params.get('recipes_limit', '')
+        return int(limit) if limit.isdigit() else None
+
+    @staticmethod
+    def attach_recipes(authors, limit=None):
+        """
+        Загружает превью рецептов для всех авторов одним запросом
+        с оконной функцией вместо запроса на каждого. Количество рецептов
+        берётся из денормализованного поля User.recipes_count.
+        """
+        authors = list(authors)
+        for author in authors:
+            author.recipes_preview = []
+        if not authors or limit == 0:
+            return
+        by_id = {author.id: author for author in authors}
+        placeholders = ', '.join(['%s'] * len(by_id))
+        params = list(by_id)
+        sql = (
+            'SELECT id, author_id, name, image, thumbnails_ready, '
+            'cooking_time, created_at, '
+            'ROW_NUMBER() OVER ('
+            'PARTITION BY author_id ORDER BY created_at DESC, id DESC'
+            ') AS row_number '
+            f'FROM {Recipe._meta.db_table} '
+            f'WHERE author_id IN ({placeholders})'
+        )
+        sql = f'SELECT * FROM ({sql}) AS ranked'
+        if limit is not None:
+            sql += ' WHERE row_number <= %s'
+            params.append(limit)
+        sql += ' ORDER BY author_id, row_number'
+        for recipe in Recipe.objects.raw(sql, params):
+            author = by_id[recipe.author_id]
+            author.recipes_preview.append(recipe)